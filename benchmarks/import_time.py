@@ -0,0 +1,84 @@
+'''
+Import-time benchmark for the app's modules. Run it from the repository root with
+
+    python benchmarks/import_time.py
+
+Every module is imported in a fresh interpreter with `python -X importtime`, after
+streamlit (which every session loads anyway). The script prints the cumulative import time
+of each module and its slowest dependencies, and exits with an error if a module imports a
+heavy dependency it should leave to another page or goes over its time budget.
+'''
+import argparse
+import os
+import subprocess
+import sys
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("sklearn", "scipy", "polars", "folium", "streamlit_folium", "httpx", "geopy", "haversine", "cv2")
+
+# Module -> (heavy modules it may import, time budget in ms)
+MODULES = {
+    "st_pages": ((), 100),
+    "helper_functions": ((), 1000),
+    "page_helpers.city": (("folium", "streamlit_folium"), 2500),
+    "page_helpers.density": (("folium", "streamlit_folium"), 2500),
+    "page_helpers.location": (("folium", "streamlit_folium", "httpx"), 3000),
+    "page_helpers.user_requests": (("folium", "streamlit_folium", "haversine", "sklearn", "scipy"), 5000),
+    "page_helpers.heatmap": (("folium", "streamlit_folium"), 2500),
+    "page_helpers.consumption": (("polars",), 2000),
+}
+
+
+def measure(module):
+    '''
+    Import module in a fresh interpreter and return its cumulative import time (ms)
+    and {imported module: cumulative time (ms)} for everything it imported
+    '''
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import streamlit; import {module}"],
+        cwd=REPOSITORY_ROOT, capture_output=True, text=True, check=True,
+    )
+
+    # Lines look like "import time:   self [us] | cumulative | imported package", the
+    # modules streamlit imported come first
+    lines = [line for line in result.stderr.splitlines() if line.startswith("import time:") and "|" in line]
+    start = max(i for i, line in enumerate(lines) if line.split("|")[2].strip() == "streamlit") + 1
+
+    imported = {}
+    for line in lines[start:]:
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            imported[name.strip()] = int(cumulative) / 1000
+    return imported[module], imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="imports per module, the fastest one is reported")
+    parser.add_argument("--top", type=int, default=5, help="number of slowest dependencies to show")
+    args = parser.parse_args()
+
+    failures = []
+    for module, (allowed, budget) in MODULES.items():
+        runs = [measure(module) for _ in range(args.repeat)]
+        total, imported = min(runs, key=lambda run: run[0])
+        print(f"{module:<30} {total:8.1f} ms (budget {budget} ms)")
+
+        slowest = sorted(((name, ms) for name, ms in imported.items() if name != module), key=lambda item: -item[1])
+        for name, ms in slowest[:args.top]:
+            print(f"    {name:<40} {ms:8.1f} ms")
+
+        heavy = sorted({name.split(".")[0] for name in imported} & set(HEAVY_MODULES) - set(allowed))
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)}")
+        if total > budget:
+            failures.append(f"{module} took {total:.1f} ms to import, over its {budget} ms budget")
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
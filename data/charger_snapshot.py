@@ -0,0 +1,80 @@
+'''
+Compact binary snapshot of the charger map data.
+
+charger_map_data.json is converted into an uncompressed Arrow IPC (Feather v2) file that
+can be memory-mapped. The state, city and charger_type strings are dictionary encoded, the
+redundant coords strings are dropped and the coordinates are also stored in radians. Build
+it ahead of deployment with
+
+    python -m data.charger_snapshot
+
+otherwise the app writes it the first time it finds the JSON newer than the snapshot.
+'''
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+CHARGER_DATA_PATH = 'data/charger_map_data.json'
+CHARGER_SNAPSHOT_PATH = 'data/charger_map_data.arrow'
+DICTIONARY_COLUMNS = ("state", "city", "charger_type")
+
+
+def read_charger_json(path=CHARGER_DATA_PATH):
+    '''
+    Read the charger JSON, dropping rows without coordinates and the coords column
+    '''
+    df = pd.read_json(path)
+
+    # If latitude and longitude are not present or empty string, drop the row
+    df = df.dropna(subset=["latitude", "longitude"])
+    df = df[df["latitude"] != ""]
+    df = df[df["longitude"] != ""]
+    df = df.drop(columns="coords", errors="ignore").reset_index(drop=True)
+
+    df["latitude"] = df["latitude"].astype("float64")
+    df["longitude"] = df["longitude"].astype("float64")
+    return df
+
+
+def write_charger_snapshot(path=CHARGER_DATA_PATH, snapshot_path=CHARGER_SNAPSHOT_PATH):
+    '''
+    Convert the charger JSON into the Arrow snapshot
+    '''
+    df = read_charger_json(path)
+    # Categoricals become dictionary arrays, with the categories sorted like pd.Categorical's
+    for column in DICTIONARY_COLUMNS:
+        df[column] = df[column].astype("category")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.append_column("latitude_radians", pa.array(np.radians(df["latitude"].to_numpy())))
+    table = table.append_column("longitude_radians", pa.array(np.radians(df["longitude"].to_numpy())))
+
+    # Uncompressed so that the file can be memory-mapped instead of decoded
+    temporary_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    feather.write_feather(table, temporary_path, compression="uncompressed")
+    os.replace(temporary_path, snapshot_path)
+    return table
+
+
+def read_charger_snapshot(path=CHARGER_DATA_PATH, snapshot_path=CHARGER_SNAPSHOT_PATH):
+    '''
+    Return the charger dataframe and an (n, 2) array of its coordinates in radians,
+    rewriting the snapshot first if the JSON is newer than it
+    '''
+    if not os.path.exists(snapshot_path) or (os.path.exists(path) and os.path.getmtime(snapshot_path) < os.path.getmtime(path)):
+        write_charger_snapshot(path, snapshot_path)
+
+    table = feather.read_table(snapshot_path, memory_map=True)
+    radians = np.column_stack([
+        table.column("latitude_radians").to_numpy(),
+        table.column("longitude_radians").to_numpy(),
+    ])
+    df = table.select([name for name in table.column_names if not name.endswith("_radians")]).to_pandas()
+    return df, radians
+
+
+if __name__ == '__main__':
+    table = write_charger_snapshot()
+    print(f"STATUS: {table.num_rows} chargers written to {CHARGER_SNAPSHOT_PATH} ({os.path.getsize(CHARGER_SNAPSHOT_PATH) / 1024:.0f} KiB)")
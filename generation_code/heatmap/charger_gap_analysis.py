@@ -0,0 +1,115 @@
+import math
+import cv2
+import numpy as np
+import pandas as pd
+
+from generate_heatmap import traffic_intensity, TRAFFIC_DATA_PATH
+from georeference import Georeference, BANGALORE_BOUNDS
+
+CHARGER_DATA_PATH = '../../data/charger_map_data.json'
+USER_REQUESTED_CHARGERS_PATH = '../../data/user_requested_chargers.csv'
+GAP_SCORE_PATH = 'gap_score.png'
+
+# Distance to the nearest charger beyond which a cell counts as completely uncovered
+DISTANCE_CAP_KM = 5.0
+
+
+def sample_raster(raster, georeference, latitude, longitude):
+    '''
+    Value of the raster at each point, NaN for points outside it
+    '''
+    rows, columns = georeference.to_pixels(latitude, longitude)
+    rows = np.floor(rows).astype(np.int64)
+    columns = np.floor(columns).astype(np.int64)
+    inside = (rows >= 0) & (rows < raster.shape[0]) & (columns >= 0) & (columns < raster.shape[1])
+
+    values = np.full(len(rows), np.nan)
+    values[inside] = raster[rows[inside], columns[inside]]
+    return values
+
+
+def nearest_charger_distance(georeference, latitude, longitude, distance_cap_km=DISTANCE_CAP_KM):
+    '''
+    Distance in km from every cell of the raster to the closest charger, computed with a single
+    Euclidean distance transform. The raster is padded by distance_cap_km on every side so that
+    chargers just outside it still count, distances beyond the cap are not exact.
+    '''
+    pixel_size_km = georeference.pixel_size_km()
+    padding = math.ceil(distance_cap_km / pixel_size_km)
+    height, width = georeference.height + 2 * padding, georeference.width + 2 * padding
+
+    rows, columns = georeference.to_pixels(latitude, longitude)
+    rows = np.floor(rows).astype(np.int64) + padding
+    columns = np.floor(columns).astype(np.int64) + padding
+    inside = (rows >= 0) & (rows < height) & (columns >= 0) & (columns < width)
+
+    # distanceTransform measures the distance to the nearest zero pixel
+    free = np.full((height, width), 255, dtype=np.uint8)
+    free[rows[inside], columns[inside]] = 0
+    if not inside.any():
+        return np.full((georeference.height, georeference.width), np.inf, dtype=np.float32)
+    distances = cv2.distanceTransform(free, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+    return distances[padding:padding + georeference.height, padding:padding + georeference.width] * pixel_size_km
+
+
+def coverage_score(intensity, distance_km, distance_cap_km=DISTANCE_CAP_KM):
+    '''
+    Traffic intensity (0-255) weighted by how far the nearest charger is, in the range 0-1.
+    High scores are busy areas without a charger nearby.
+    '''
+    weight = np.minimum(distance_km, distance_cap_km) / distance_cap_km
+    return (intensity.astype(np.float32) / 255) * weight
+
+
+def charger_gap_analysis(traffic_data, charger_coordinates, request_coordinates,
+                         bounds=BANGALORE_BOUNDS, distance_cap_km=DISTANCE_CAP_KM):
+    '''
+    Join the traffic raster with charger and user-requested locations. Returns the
+    traffic intensity at every charger and request, the distance (km) from every cell
+    to its nearest charger and the coverage score of every cell.
+    '''
+    intensity = traffic_intensity(traffic_data)
+    georeference = Georeference(bounds, intensity.shape[1], intensity.shape[0])
+
+    charger_coordinates = np.asarray(charger_coordinates, dtype=np.float64).reshape(-1, 2)
+    request_coordinates = np.asarray(request_coordinates, dtype=np.float64).reshape(-1, 2)
+
+    distance_km = nearest_charger_distance(georeference, charger_coordinates[:, 0], charger_coordinates[:, 1], distance_cap_km)
+    return {
+        "georeference": georeference,
+        "intensity": intensity,
+        "charger_intensity": sample_raster(intensity, georeference, charger_coordinates[:, 0], charger_coordinates[:, 1]),
+        "request_intensity": sample_raster(intensity, georeference, request_coordinates[:, 0], request_coordinates[:, 1]),
+        "distance_km": distance_km,
+        "score": coverage_score(intensity, distance_km, distance_cap_km),
+    }
+
+
+def top_gaps(score, georeference, n=10):
+    '''
+    (latitude, longitude, score) of the n highest scoring cells
+    '''
+    flat = np.argpartition(score.ravel(), -n)[-n:]
+    flat = flat[np.argsort(score.ravel()[flat])[::-1]]
+    rows, columns = np.unravel_index(flat, score.shape)
+    latitude, longitude = georeference.to_coordinates(rows, columns)
+    return list(zip(latitude, longitude, score.ravel()[flat]))
+
+
+if __name__ == '__main__':
+    chargers = pd.read_json(CHARGER_DATA_PATH)
+    chargers = chargers[["latitude", "longitude"]].apply(pd.to_numeric, errors="coerce").dropna()
+    requests = pd.read_csv(USER_REQUESTED_CHARGERS_PATH)
+
+    result = charger_gap_analysis(cv2.imread(TRAFFIC_DATA_PATH), chargers.to_numpy(), requests.to_numpy())
+
+    covered = ~np.isnan(result["charger_intensity"])
+    print(f"STATUS: {covered.sum()} chargers lie on the traffic map, mean traffic intensity {np.nanmean(result['charger_intensity']):.1f}")
+    print(f"STATUS: Mean traffic intensity at user requested locations {np.nanmean(result['request_intensity']):.1f}")
+
+    score = cv2.applyColorMap(np.uint8(result["score"] * 255), cv2.COLORMAP_JET)
+    cv2.imwrite(GAP_SCORE_PATH, score)
+    print("STATUS: Coverage score complete, check gap_score.png")
+
+    for latitude, longitude, value in top_gaps(result["score"], result["georeference"]):
+        print(f"{latitude:.5f}, {longitude:.5f}: {value:.3f}")
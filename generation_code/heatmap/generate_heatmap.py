@@ -1,127 +1,482 @@
-import cv2
-import os
-import numpy as np
-
-def get_file_names(directory):
-    file_names = []
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            file_path = os.path.splitext(file)[0]
-            file_names.append(file_path)
-    return file_names
-
-# Subtracting the traffic data images with the template image
-
-template_image_path = 'Map_images/map_template.png'
-template_image = cv2.imread(template_image_path)
-
-subtract_file_names = get_file_names('Map_images/Original_map_images')
-
-for file_name in subtract_file_names:
-    image_path = 'Map_images/Original_map_images/' + file_name + '.png'
-    image = cv2.imread(image_path)
-
-    subtracted_image = cv2.subtract(template_image, image)
-    subtracted_image = cv2.bitwise_not(subtracted_image)
-    cv2.imwrite('Map_images/Subtracted_images/' + file_name + '.png', subtracted_image)
-
-print("STATUS: Subtraction of images complete, Check Subtracted_images directory")
-
-
-#Blending the subtracted images together to create the a single image of the traffic data
-
-directory_path = 'Map_images/Subtracted_images'
-
-# Initialize an empty list to store the images
-image_list = []
-
-# Iterate over the images in the directory
-for root, dirs, files in os.walk(directory_path):
-    for file in files:
-        # Read each image and append it to the list
-        image_path = os.path.join(root, file)
-        image = cv2.imread(image_path)
-        image_list.append(image)
-
-# Check if at least two images are available
-if len(image_list) < 2:
-    print("Insufficient images for blending.")
-    exit()
-
-# Initialize the first image as the base for blending
-blended_image = image_list[0]
-
-# Blend the remaining images iteratively
-for i in range(1, len(image_list)):
-    alpha = 1.0 / (i + 1)  # Calculate the weight for the current image
-    beta = 1.0 - alpha     # Calculate the weight for the existing blended image
-    blended_image = cv2.addWeighted(blended_image, beta, image_list[i], alpha, 0)
-
-cv2.imwrite('blended.png', blended_image)
-
-print("STATUS: Blending of images complete, check blended.png")
-
-# Isolating the traffic data from the blended image
-
-def remove_blues(image):
-    # Convert image to the HSV color space
-    hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-
-    # Define the lower and upper thresholds for red, orange, and blue colors
-    lower_red1 = np.array([0, 100, 100], dtype=np.uint8)
-    upper_red1 = np.array([10, 255, 255], dtype=np.uint8)
-    lower_red2 = np.array([170, 100, 100], dtype=np.uint8)
-    upper_red2 = np.array([180, 255, 255], dtype=np.uint8)
-    lower_orange = np.array([10, 100, 100], dtype=np.uint8)
-    upper_orange = np.array([25, 255, 255], dtype=np.uint8)
-
-    # Create binary masks for red and orange colors
-    mask_red1 = cv2.inRange(hsv_image, lower_red1, upper_red1)
-    mask_red2 = cv2.inRange(hsv_image, lower_red2, upper_red2)
-    mask_orange = cv2.inRange(hsv_image, lower_orange, upper_orange)
-
-    # Combine the masks to get the final mask (excluding blue)
-    mask = cv2.bitwise_or(mask_red1, mask_red2)
-    mask = cv2.bitwise_or(mask, mask_orange)
-
-    # # Apply the mask to the original image to remove blues
-    rgba_image = cv2.bitwise_and(image, image, mask=mask)
-
-    return rgba_image
-
-# Load the image
-image = cv2.imread('blended.png')
-
-# Remove blues and create a transparent background
-final_image = remove_blues(image)
-cv2.imwrite('traffic_data.png', final_image)
-
-print("STATUS: Isolation of traffic data complete, check traffic_data.png")
-
-
-# Generating the heatmap using the blended images
-
-def create_heatmap(image):
-    # Convert image to grayscale
-    grayscale = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-
-    # Apply Gaussian blur to reduce noise
-    blurred = cv2.GaussianBlur(grayscale, (15, 15), 0)
-
-    # Normalize the blurred image to a range of 0-255
-    normalized = cv2.normalize(blurred, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8UC1)
-
-    # Apply a colormap to create the heatmap
-    heatmap = cv2.applyColorMap(normalized, cv2.COLORMAP_JET)
-
-    return heatmap
-
-# Load the image
-image = cv2.imread('traffic_data.png')
-
-# Create the heatmap
-heatmap = create_heatmap(image)
-
-cv2.imwrite('heatmap.png', heatmap)
-
-print("STATUS: Heatmap generation complete, check heatmap.png")
\ No newline at end of file
+import cv2
+import os
+import json
+import math
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+
+from multiprocessing import Pool
+
+try:
+    from georeference import Georeference, BANGALORE_BOUNDS, TILE_SIZE, world_pixels
+except ModuleNotFoundError:
+    # Imported by the app (for TrafficCube) from the repository root rather than run as a script
+    from generation_code.heatmap.georeference import Georeference, BANGALORE_BOUNDS, TILE_SIZE, world_pixels
+
+TEMPLATE_IMAGE_PATH = 'Map_images/map_template.png'
+ORIGINAL_IMAGES_DIRECTORY = 'Map_images/Original_map_images'
+SUBTRACTED_IMAGES_DIRECTORY = 'Map_images/Subtracted_images'
+# Internal copies of every subtracted image, in INTERMEDIATE_FORMAT ('npy' or 'png')
+SUBTRACTED_CACHE_DIRECTORY = 'Map_images/Subtracted_cache'
+INTERMEDIATE_FORMAT = 'npy'
+# Subtracted images shown on the Traffic Heatmap page, the only ones also written to SUBTRACTED_IMAGES_DIRECTORY
+DISPLAY_SUBTRACTED_IMAGES = ('Sun_8', 'fri_20')
+BLENDED_IMAGE_PATH = 'blended.png'
+TRAFFIC_DATA_PATH = 'traffic_data.png'
+HEATMAP_PATH = 'heatmap.png'
+BLEND_STATE_PATH = 'blend_state.npz'
+TRAFFIC_CUBE_PATH = 'traffic_cube.npy'
+TRAFFIC_CUBE_INDEX_PATH = 'traffic_cube.json'
+# Served by Streamlit's static file serving at <server.baseUrlPath>/app/static/heatmap_tiles/{z}/{x}/{y}.png
+TILES_DIRECTORY = '../../static/heatmap_tiles'
+
+DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+WEEKDAYS = DAYS[:5]
+WEEKEND = DAYS[5:]
+
+
+def get_file_names(directory):
+    file_names = []
+    for root, dirs, files in os.walk(directory):
+        for file in files:
+            file_path = os.path.splitext(file)[0]
+            file_names.append(file_path)
+    return file_names
+
+
+# Subtracting the traffic data images with the template image
+
+def subtract_image(template_image, image):
+    # Keep only what differs from the template (the traffic overlay) and invert it
+    subtracted_image = cv2.subtract(template_image, image)
+    return cv2.bitwise_not(subtracted_image)
+
+
+# Template image of the worker process, loaded once by init_worker
+_template_image = None
+
+
+def init_worker(template_image_path):
+    global _template_image
+    # Each worker handles one image at a time, so don't let OpenCV spawn threads of its own
+    cv2.setNumThreads(1)
+    _template_image = cv2.imread(template_image_path)
+
+
+def save_subtracted(file_name, image, directory=SUBTRACTED_CACHE_DIRECTORY):
+    # Uncompressed .npy (or fast, lightly compressed PNG) for images that are only read back by the pipeline
+    if INTERMEDIATE_FORMAT == 'npy':
+        np.save(os.path.join(directory, file_name + '.npy'), image)
+    else:
+        cv2.imwrite(os.path.join(directory, file_name + '.png'), image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+
+
+def load_subtracted(file_name, directory=SUBTRACTED_CACHE_DIRECTORY):
+    if INTERMEDIATE_FORMAT == 'npy':
+        return np.load(os.path.join(directory, file_name + '.npy'))
+    return cv2.imread(os.path.join(directory, file_name + '.png'))
+
+
+def delete_subtracted(file_name, directory=SUBTRACTED_CACHE_DIRECTORY):
+    os.remove(os.path.join(directory, file_name + '.' + INTERMEDIATE_FORMAT))
+
+
+def subtract_file(paths):
+    # Decode, subtract and save one traffic data image inside a worker process
+    file_name, image_path, display_path = paths
+    image = cv2.imread(image_path)
+    subtracted_image = subtract_image(_template_image, image)
+    save_subtracted(file_name, subtracted_image)
+    if display_path:
+        cv2.imwrite(display_path, subtracted_image)
+    return subtracted_image
+
+
+# Blending the subtracted images together to create the a single image of the traffic data
+
+class RunningMean:
+    '''
+    Streaming per-pixel mean of images, kept in a single float32 accumulator
+    '''
+    def __init__(self):
+        self.sum = None
+        self.count = 0
+
+    def add(self, image):
+        if self.sum is None:
+            self.sum = image.astype(np.float32)
+        else:
+            self.sum += image
+        self.count += 1
+
+    def remove(self, image):
+        # Pixel values are integers, so the float32 sum stays exact when images are taken back out
+        self.sum -= image
+        self.count -= 1
+
+    def result(self):
+        return np.rint(self.sum / self.count).astype(np.uint8)
+
+
+def subtract_and_blend(file_names, template_image_path=TEMPLATE_IMAGE_PATH,
+                       original_directory=ORIGINAL_IMAGES_DIRECTORY,
+                       subtracted_directory=SUBTRACTED_IMAGES_DIRECTORY, processes=None, blend=None):
+    '''
+    Subtract the template from every traffic data image in a process pool and fold the
+    results into a running mean (a new one unless blend is given) as they arrive,
+    so only one image is held at a time
+    '''
+    if not file_names:
+        return blend or RunningMean()
+
+    os.makedirs(SUBTRACTED_CACHE_DIRECTORY, exist_ok=True)
+    paths = [
+        (
+            file_name,
+            os.path.join(original_directory, file_name + '.png'),
+            os.path.join(subtracted_directory, file_name + '.png') if file_name in DISPLAY_SUBTRACTED_IMAGES else None,
+        )
+        for file_name in file_names
+    ]
+
+    blend = blend or RunningMean()
+    with Pool(processes, initializer=init_worker, initargs=(template_image_path,)) as pool:
+        for subtracted_image in pool.imap_unordered(subtract_file, paths):
+            blend.add(subtracted_image)
+    return blend
+
+
+# Persisting the blend so that new snapshots can be folded in without starting over
+
+def file_hash(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def build_manifest(paths, previous=None):
+    '''
+    Map each name in paths to the size, mtime and SHA-256 of its file. Files whose size and
+    mtime match the previous manifest keep their recorded hash instead of being read again.
+    '''
+    previous = previous or {}
+    manifest = {}
+    for name, path in paths.items():
+        stat = os.stat(path)
+        entry = previous.get(name)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            manifest[name] = entry
+        else:
+            manifest[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_hash(path)}
+    return manifest
+
+
+def save_blend_state(blend, manifest, path=BLEND_STATE_PATH):
+    # Write to a temporary file first so an interrupted run never leaves a corrupt state behind
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        np.savez(file, sum=blend.sum, count=blend.count, manifest=json.dumps(manifest))
+    os.replace(temporary_path, path)
+
+
+def discard_blend_state(path=BLEND_STATE_PATH):
+    # Drop the saved state before the subtracted images it was built from are replaced, so that
+    # a run that fails before saving the new state is followed by a full rebuild
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def load_blend_state(path=BLEND_STATE_PATH):
+    # Return the saved (blend, manifest), or None if there is no usable saved state
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as state:
+        if 'manifest' not in state:
+            return None
+        blend = RunningMean()
+        blend.sum = state['sum']
+        blend.count = int(state['count'])
+        manifest = json.loads(str(state['manifest']))
+    return blend, manifest
+
+
+# Keeping every time slot in a day x hour x H x W x 3 cube, memory-mapped from disk
+
+def parse_slot(file_name):
+    # '<day>_<hour>' (e.g. 'Sun_8') -> ('sun', 8)
+    day, hour = file_name.split('_')
+    return day.lower()[:3], int(hour)
+
+
+def update_traffic_cube(file_names, changed, removed, rebuild=False,
+                        path=TRAFFIC_CUBE_PATH, index_path=TRAFFIC_CUBE_INDEX_PATH):
+    '''
+    Copy the subtracted images of the changed snapshots into their day/hour slot of the cube
+    and mark removed snapshots as missing. The cube is rebuilt from every subtracted image
+    when asked to, when it does not exist yet or when the set of hours changes.
+    '''
+    hours = sorted({parse_slot(file_name)[1] for file_name in file_names})
+
+    index = None
+    if not rebuild and os.path.exists(path) and os.path.exists(index_path):
+        with open(index_path) as file:
+            index = json.load(file)
+        if index['hours'] != hours:
+            index = None
+
+    if index is None:
+        sample = load_subtracted(file_names[0])
+        cube = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=(len(DAYS), len(hours)) + sample.shape)
+        index = {'days': list(DAYS), 'hours': hours, 'present': [[False] * len(hours) for _ in DAYS]}
+        changed, removed = file_names, []
+    else:
+        cube = np.load(path, mmap_mode='r+')
+
+    for file_name in removed:
+        day, hour = parse_slot(file_name)
+        if hour in hours:
+            index['present'][DAYS.index(day)][hours.index(hour)] = False
+
+    # One slot at a time, so only a single image is decoded at once
+    for file_name in changed:
+        day, hour = parse_slot(file_name)
+        cube[DAYS.index(day), hours.index(hour)] = load_subtracted(file_name)
+        index['present'][DAYS.index(day)][hours.index(hour)] = True
+
+    cube.flush()
+    del cube
+    with open(index_path, 'w') as file:
+        json.dump(index, file)
+
+
+class TrafficCube:
+    '''
+    Read-only, memory-mapped view of the subtracted traffic images by day of week and hour.
+    Blends and heatmaps for any subset of time slots are computed on the fly, one slot at a time.
+    '''
+    def __init__(self, path=TRAFFIC_CUBE_PATH, index_path=TRAFFIC_CUBE_INDEX_PATH):
+        self.cube = np.load(path, mmap_mode='r')
+        with open(index_path) as file:
+            index = json.load(file)
+        self.days = index['days']
+        self.hours = index['hours']
+        self.present = np.array(index['present'], dtype=bool)
+
+    def slots(self, days=None, hours=None):
+        # (day, hour) positions of the captured slots matching the filters, None meaning all and an empty list none
+        day_positions = [self.days.index(day) for day in (self.days if days is None else days)]
+        hour_positions = [self.hours.index(hour) for hour in (self.hours if hours is None else hours)]
+        return [(d, h) for d in day_positions for h in hour_positions if self.present[d, h]]
+
+    def blend(self, days=None, hours=None):
+        blend = RunningMean()
+        for d, h in self.slots(days, hours):
+            blend.add(self.cube[d, h])
+        if blend.count == 0:
+            raise ValueError("No traffic data captured for the selected days and hours")
+        return blend.result()
+
+    def heatmap(self, days=None, hours=None):
+        return create_heatmap(remove_blues(self.blend(days, hours)))
+
+
+# Isolating the traffic data from the blended image
+
+def remove_blues(image):
+    # Convert image to the HSV color space
+    hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+
+    # Define the lower and upper thresholds for red, orange, and blue colors
+    lower_red1 = np.array([0, 100, 100], dtype=np.uint8)
+    upper_red1 = np.array([10, 255, 255], dtype=np.uint8)
+    lower_red2 = np.array([170, 100, 100], dtype=np.uint8)
+    upper_red2 = np.array([180, 255, 255], dtype=np.uint8)
+    lower_orange = np.array([10, 100, 100], dtype=np.uint8)
+    upper_orange = np.array([25, 255, 255], dtype=np.uint8)
+
+    # Create binary masks for red and orange colors
+    mask_red1 = cv2.inRange(hsv_image, lower_red1, upper_red1)
+    mask_red2 = cv2.inRange(hsv_image, lower_red2, upper_red2)
+    mask_orange = cv2.inRange(hsv_image, lower_orange, upper_orange)
+
+    # Combine the masks to get the final mask (excluding blue)
+    mask = cv2.bitwise_or(mask_red1, mask_red2)
+    mask = cv2.bitwise_or(mask, mask_orange)
+
+    # # Apply the mask to the original image to remove blues
+    rgba_image = cv2.bitwise_and(image, image, mask=mask)
+
+    return rgba_image
+
+
+# Generating the heatmap using the blended images
+
+def traffic_intensity(image):
+    # Convert image to grayscale
+    grayscale = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    # Apply Gaussian blur to reduce noise
+    blurred = cv2.GaussianBlur(grayscale, (15, 15), 0)
+
+    # Normalize the blurred image to a range of 0-255
+    return cv2.normalize(blurred, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8UC1)
+
+
+def create_heatmap(image):
+    normalized = traffic_intensity(image)
+
+    # Apply a colormap to create the heatmap
+    heatmap = cv2.applyColorMap(normalized, cv2.COLORMAP_JET)
+
+    return heatmap
+
+
+# Cutting the heatmap into a slippy-map (XYZ) tile pyramid for map overlays
+
+def write_tiles(heatmap, intensity, bounds=BANGALORE_BOUNDS, directory=TILES_DIRECTORY, zoom_levels=None):
+    '''
+    Write the heatmap as transparent 256 x 256 PNG tiles under directory/{z}/{x}/{y}.png.
+    Traffic intensity is used as the alpha channel so that quiet areas don't hide the map,
+    and tiles without any traffic are skipped. Returns the (min, max) zoom written.
+    The pyramid is written next to directory and then replaces it, so tiles of an earlier
+    run that this one does not write don't linger.
+    '''
+    georeference = Georeference(bounds, heatmap.shape[1], heatmap.shape[0])
+    native_zoom = round(georeference.native_zoom())
+    if zoom_levels is None:
+        zoom_levels = range(native_zoom - 3, native_zoom + 3)
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.tiles_', dir=parent)
+    try:
+        write_tile_pyramid(np.dstack([heatmap, intensity]), georeference, native_zoom, staging, zoom_levels)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    # mkdtemp only lets the owner in, the tiles are served as static files
+    os.chmod(staging, 0o755)
+
+    if os.path.exists(directory):
+        previous = tempfile.mkdtemp(prefix='.tiles_', dir=parent)
+        os.rename(directory, os.path.join(previous, 'tiles'))
+        os.rename(staging, directory)
+        shutil.rmtree(previous)
+    else:
+        os.rename(staging, directory)
+
+    return min(zoom_levels), max(zoom_levels)
+
+
+def write_tile_pyramid(overlay, georeference, native_zoom, directory, zoom_levels):
+    '''
+    Write the BGRA overlay's tiles for every zoom level under directory/{z}/{x}/{y}.png
+    '''
+    for zoom in zoom_levels:
+        x0, y0 = world_pixels(georeference.north, georeference.west, zoom)
+        x1, y1 = world_pixels(georeference.south, georeference.east, zoom)
+
+        # Shrink the overlay once per lower zoom level instead of sampling it sparsely per tile
+        if zoom < native_zoom:
+            source = cv2.resize(overlay, (max(1, round(x1 - x0)), max(1, round(y1 - y0))), interpolation=cv2.INTER_AREA)
+        else:
+            source = overlay
+        scale_x = source.shape[1] / (x1 - x0)
+        scale_y = source.shape[0] / (y1 - y0)
+
+        for tile_x in range(math.floor(x0 / TILE_SIZE), math.ceil(x1 / TILE_SIZE)):
+            for tile_y in range(math.floor(y0 / TILE_SIZE), math.ceil(y1 / TILE_SIZE)):
+                # Maps tile pixels to overlay pixels
+                transform = np.float32([
+                    [scale_x, 0, (tile_x * TILE_SIZE - x0) * scale_x],
+                    [0, scale_y, (tile_y * TILE_SIZE - y0) * scale_y],
+                ])
+                tile = cv2.warpAffine(
+                    source, transform, (TILE_SIZE, TILE_SIZE),
+                    flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_CONSTANT, borderValue=0,
+                )
+                if not tile[:, :, 3].any():
+                    continue
+
+                tile_directory = os.path.join(directory, str(zoom), str(tile_x))
+                os.makedirs(tile_directory, exist_ok=True)
+                cv2.imwrite(os.path.join(tile_directory, f'{tile_y}.png'), tile)
+
+
+def generate_heatmap(processes=None, incremental=True):
+    '''
+    Run the whole pipeline: subtract -> blend -> isolate traffic data -> heatmap.
+    When incremental, only snapshots that are new or changed since the saved blend state
+    are subtracted and folded in (removed ones are taken back out of the blend).
+    '''
+    file_names = get_file_names(ORIGINAL_IMAGES_DIRECTORY)
+
+    # Check if at least two images are available
+    if len(file_names) < 2:
+        print("Insufficient images for blending.")
+        return None
+
+    state = load_blend_state() if incremental else None
+    previous_manifest = state[1] if state else {}
+
+    paths = {TEMPLATE_IMAGE_PATH: TEMPLATE_IMAGE_PATH}
+    for file_name in file_names:
+        paths[file_name] = os.path.join(ORIGINAL_IMAGES_DIRECTORY, file_name + '.png')
+    manifest = build_manifest(paths, previous_manifest)
+
+    def changed_since_last_run(name):
+        return name not in previous_manifest or previous_manifest[name]['sha256'] != manifest[name]['sha256']
+
+    # A different template invalidates every subtracted image
+    rebuild = state is None or changed_since_last_run(TEMPLATE_IMAGE_PATH)
+    if rebuild:
+        changed, removed = file_names, []
+        discard_blend_state()
+        blend = subtract_and_blend(file_names, processes=processes)
+    else:
+        blend = state[0]
+        changed = [file_name for file_name in file_names if changed_since_last_run(file_name)]
+        removed = [file_name for file_name in previous_manifest if file_name not in manifest]
+        if not changed and not removed:
+            print("STATUS: No new or changed images, heatmap is up to date")
+            return None
+        discard_blend_state()
+
+        # Take the outdated subtracted images back out of the blend before they are replaced
+        for file_name in removed + [file_name for file_name in changed if file_name in previous_manifest]:
+            blend.remove(load_subtracted(file_name))
+            if file_name in removed:
+                delete_subtracted(file_name)
+
+        blend = subtract_and_blend(changed, processes=processes, blend=blend)
+
+    print("STATUS: Subtraction of images complete, Check Subtracted_images directory")
+
+    update_traffic_cube(file_names, changed, removed, rebuild=rebuild)
+    print("STATUS: Traffic cube updated, check traffic_cube.npy")
+
+    blended_image = blend.result()
+    cv2.imwrite(BLENDED_IMAGE_PATH, blended_image)
+    print("STATUS: Blending of images complete, check blended.png")
+
+    # Remove blues and create a transparent background
+    traffic_data = remove_blues(blended_image)
+    cv2.imwrite(TRAFFIC_DATA_PATH, traffic_data)
+    print("STATUS: Isolation of traffic data complete, check traffic_data.png")
+
+    heatmap = create_heatmap(traffic_data)
+    cv2.imwrite(HEATMAP_PATH, heatmap)
+    print("STATUS: Heatmap generation complete, check heatmap.png")
+
+    write_tiles(heatmap, traffic_intensity(traffic_data))
+    print("STATUS: Heatmap tiles complete, check static/heatmap_tiles")
+
+    # Saved last, so the next run only skips work once every output above has been written
+    save_blend_state(blend, manifest)
+
+    return heatmap
+
+
+if __name__ == '__main__':
+    generate_heatmap()
@@ -0,0 +1,60 @@
+import math
+import numpy as np
+
+# Corners (north, west, south, east) of the Bangalore map template. The snapshots were taken
+# at zoom level 12 around (12.9726, 77.5941) in a 1920 x 1080 window, so these are derived from
+# that view and should be re-calibrated if the template is captured differently.
+BANGALORE_BOUNDS = (13.153185, 77.264479, 12.791860, 77.923659)
+
+
+def _mercator(latitude):
+    return np.log(np.tan(np.pi / 4 + np.radians(latitude) / 2))
+
+
+class Georeference:
+    '''
+    Maps between (latitude, longitude) and (row, column) of a Web Mercator raster,
+    such as a Google Maps screenshot, given the latitude/longitude of its corners
+    '''
+    def __init__(self, bounds, width, height):
+        self.north, self.west, self.south, self.east = bounds
+        self.width = width
+        self.height = height
+
+    def to_pixels(self, latitude, longitude):
+        # Fractional (row, column) of each point, which may fall outside the raster
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        top, bottom = _mercator(self.north), _mercator(self.south)
+        rows = (top - _mercator(latitude)) / (top - bottom) * self.height
+        columns = (longitude - self.west) / (self.east - self.west) * self.width
+        return rows, columns
+
+    def to_coordinates(self, rows, columns):
+        top, bottom = _mercator(self.north), _mercator(self.south)
+        y = top - (np.asarray(rows, dtype=np.float64) + 0.5) / self.height * (top - bottom)
+        latitude = np.degrees(2 * np.arctan(np.exp(y)) - np.pi / 2)
+        longitude = self.west + (np.asarray(columns, dtype=np.float64) + 0.5) / self.width * (self.east - self.west)
+        return latitude, longitude
+
+    def pixel_size_km(self):
+        # Ground size of one pixel at the centre of the raster (Mercator scale is uniform in both axes)
+        center = math.radians((self.north + self.south) / 2)
+        return (self.east - self.west) / self.width * 111.32 * math.cos(center)
+
+    def native_zoom(self):
+        # Slippy-map zoom level at which one raster pixel is one map pixel
+        return math.log2(self.width / (self.east - self.west) * 360 / TILE_SIZE)
+
+
+TILE_SIZE = 256
+
+
+def world_pixels(latitude, longitude, zoom):
+    '''
+    Global (x, y) pixel position of a point in the slippy-map (XYZ) tiling at zoom
+    '''
+    size = TILE_SIZE * 2 ** zoom
+    x = (np.asarray(longitude, dtype=np.float64) + 180) / 360 * size
+    y = (1 - _mercator(latitude) / np.pi) / 2 * size
+    return x, y
@@ -1,421 +1,816 @@
 import json
-import requests
 import os
-import math
-import folium
+import sqlite3
+import sys
+import threading
+import time
+
+from collections import OrderedDict
 
-import streamlit as st
-import streamlit_folium as st_folium
 import pandas as pd
 import numpy as np
-import polars as pl
 
+from data.charger_data import cities
+
+# --------------------------------------------------
+# RESOURCE REGISTRY
+# --------------------------------------------------
+
+# Returned by lookups (e.g. PersistentTTLCache.get) when a key has no (fresh) cached entry
+MISSING = object()
 
-from haversine import haversine
-from geopy.geocoders import Nominatim
-from sklearn.cluster import DBSCAN
+# Bytes the process-wide resources may hold before least recently used entries are dropped
+RESOURCE_MEMORY_BUDGET = int(os.environ.get("RESOURCE_MEMORY_BUDGET", 1024 ** 3))
+
+
+def estimate_size(value):
+    '''
+    Approximate memory footprint of a cached value in bytes
+    '''
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if isinstance(getattr(value, "nbytes", None), (int, np.integer)):  # numpy, pyarrow, ChargerStore
+        return int(value.nbytes)
+    if callable(getattr(value, "estimated_size", None)):  # polars
+        return int(value.estimated_size())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class Resource:
+    '''
+    Declaration and counters of one kind of resource in a ResourceRegistry
+    '''
+    def __init__(self, name, factory, budget=None, max_entries=None, depends_on=(), session=False, on_evict=None,
+                 pinned=False):
+        self.name = name
+        self.factory = factory
+        self.budget = budget
+        self.max_entries = max_entries
+        self.depends_on = tuple(depends_on)
+        self.session = session
+        self.on_evict = on_evict
+        self.pinned = pinned
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by every invalidation, so entries built from stale data are not kept
+        self.generation = 0
+        # Serialises building the entries of this resource
+        self.lock = threading.Lock()
+
+
+class ResourceRegistry:
+    '''
+    Named, lazily built resources shared by every session of the process: datasets, indexes
+    and clients that would otherwise be loaded once per session or rerun.
+
+    get(name, *key) returns the resource's entry for key, calling factory(*key) on a miss.
+    Least recently used entries are evicted when a resource goes over its max_entries or byte
+    budget, or the registry over its total budget, and on_evict(value) is called on them.
+    invalidate(name) drops a resource's entries and those of every resource that depends on it.
+    Resources registered with session=True hold derived results per session, in st.session_state.
+    Resources registered with pinned=True (clients and connections that other threads may be
+    using) are left out of the total budget and are only dropped by invalidate().
+    '''
+    def __init__(self, budget=RESOURCE_MEMORY_BUDGET):
+        self.budget = budget
+        self._resources = {}
+        # (name, key) -> (value, size) in least recently used order
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def register(self, name, factory=None, budget=None, max_entries=None, depends_on=(), session=False, on_evict=None,
+                 pinned=False):
+        '''
+        Declare a resource, replacing any resource previously registered under name
+        '''
+        with self._lock:
+            self._resources[name] = Resource(name, factory, budget, max_entries, depends_on, session, on_evict, pinned)
+
+    def get(self, name, *key, factory=None):
+        '''
+        Return the entry of resource name for key, building it on a miss with factory(),
+        if given, or the registered factory(*key)
+        '''
+        resource = self._resources[name]
+        build = factory or (lambda: resource.factory(*key))
+        if resource.session:
+            return self._get_session(resource, key, build)
+
+        entry_key = (name, key)
+        value = self._lookup(resource, entry_key)
+        if value is not MISSING:
+            return value
+
+        with resource.lock:
+            with self._lock:
+                # Built by another thread while this one waited for the lock
+                if entry_key in self._entries:
+                    return self._lookup(resource, entry_key)
+                resource.misses += 1
+                generation = resource.generation
+
+            value = build()
+            size = estimate_size(value)
+
+            with self._lock:
+                evicted = []
+                if resource.generation == generation:
+                    self._entries[entry_key] = (value, size)
+                    evicted = self._evict(resource)
+        self._run_evict_hooks(evicted)
+        return value
+
+    def _lookup(self, resource, entry_key):
+        with self._lock:
+            if entry_key not in self._entries:
+                return MISSING
+            resource.hits += 1
+            self._entries.move_to_end(entry_key)
+            return self._entries[entry_key][0]
+
+    def _get_session(self, resource, key, build):
+        import streamlit as st
+
+        entries = st.session_state.setdefault("_resources", {}).setdefault(resource.name, OrderedDict())
+        with self._lock:
+            entry = entries.get(key)
+            if entry is not None and entry[0] == resource.generation:
+                resource.hits += 1
+                entries.move_to_end(key)
+                return entry[1]
+            resource.misses += 1
+            generation = resource.generation
+
+        value = build()
+        entries[key] = (generation, value, estimate_size(value))
+        entries.move_to_end(key)
+        while len(entries) > 1 and (
+            (resource.max_entries and len(entries) > resource.max_entries)
+            or (resource.budget and sum(entry[2] for entry in entries.values()) > resource.budget)
+        ):
+            entries.popitem(last=False)
+            resource.evictions += 1
+        return value
+
+    def _evict(self, resource):
+        '''
+        Drop least recently used entries until resource and the registry are within their
+        limits, never dropping the most recent entry. Returns the dropped (resource, value) pairs.
+        '''
+        evicted = []
+        own = [entry_key for entry_key in self._entries if entry_key[0] == resource.name]
+        while len(own) > 1 and (
+            (resource.max_entries and len(own) > resource.max_entries)
+            or (resource.budget and sum(self._entries[entry_key][1] for entry_key in own) > resource.budget)
+        ):
+            evicted.append(self._drop(own.pop(0)))
+
+        # Pinned resources neither count toward the total budget nor are dropped to meet it
+        unpinned = [entry_key for entry_key in self._entries if not self._resources[entry_key[0]].pinned]
+        while len(unpinned) > 1 and sum(self._entries[entry_key][1] for entry_key in unpinned) > self.budget:
+            evicted.append(self._drop(unpinned.pop(0)))
+        return evicted
+
+    def _drop(self, entry_key):
+        resource = self._resources[entry_key[0]]
+        resource.evictions += 1
+        return resource, self._entries.pop(entry_key)[0]
+
+    def _run_evict_hooks(self, evicted):
+        # Outside the registry lock, the hooks may block on threads that use the registry
+        for resource, value in evicted:
+            if resource.on_evict is not None:
+                resource.on_evict(value)
+
+    def invalidate(self, name, *key):
+        '''
+        Drop the entries of resource name, or only its entry for key, together with all the
+        entries of the resources that depend on it. For session resources a key only drops the
+        entry of the current session.
+        '''
+        evicted = []
+        with self._lock:
+            self._invalidate(name, key, evicted)
+        self._run_evict_hooks(evicted)
+
+    def invalidate_dependents(self, name):
+        '''
+        Drop the entries of every resource that depends on resource name, e.g. after it changed in place
+        '''
+        evicted = []
+        with self._lock:
+            for dependent in list(self._resources.values()):
+                if name in dependent.depends_on:
+                    self._invalidate(dependent.name, (), evicted)
+        self._run_evict_hooks(evicted)
+
+    def _invalidate(self, name, key, evicted):
+        resource = self._resources[name]
+        if resource.session and key:
+            import streamlit as st
+
+            st.session_state.get("_resources", {}).get(name, {}).pop(key, None)
+            return
+
+        resource.generation += 1
+        for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == name and (not key or entry_key[1] == key)]:
+            evicted.append(self._drop(entry_key))
+        for dependent in list(self._resources.values()):
+            if name in dependent.depends_on:
+                self._invalidate(dependent.name, (), evicted)
+
+    def resize(self, name, *key):
+        '''
+        Measure the size of an entry again after it changed in place
+        '''
+        entry_key = (name, key)
+        evicted = []
+        with self._lock:
+            if entry_key in self._entries:
+                value = self._entries[entry_key][0]
+                self._entries[entry_key] = (value, estimate_size(value))
+                evicted = self._evict(self._resources[name])
+        self._run_evict_hooks(evicted)
+
+    def stats(self):
+        '''
+        Hits, misses, evictions, entries and bytes of every resource. Entries and bytes of
+        session resources only cover the current session.
+        '''
+        with self._lock:
+            stats = {
+                name: {"hits": resource.hits, "misses": resource.misses, "evictions": resource.evictions,
+                       "entries": 0, "bytes": 0, "budget": resource.budget}
+                for name, resource in self._resources.items()
+            }
+            for (name, _), (_, size) in self._entries.items():
+                stats[name]["entries"] += 1
+                stats[name]["bytes"] += size
+
+        sessions = [name for name, resource in self._resources.items() if resource.session]
+        if sessions:
+            import streamlit as st
+
+            for name in sessions:
+                entries = st.session_state.get("_resources", {}).get(name, {})
+                stats[name]["entries"] = len(entries)
+                stats[name]["bytes"] = sum(entry[2] for entry in entries.values())
+        return stats
+
+
+resources = ResourceRegistry()
 
-from data.charger_data import color_map
 
 # --------------------------------------------------
 # DATA HELPERS
 # --------------------------------------------------
 
-def process_data():
+CHARGER_DATA_PATH = 'data/charger_map_data.json'
+CHARGER_SNAPSHOT_PATH = 'data/charger_map_data.arrow'
+EARTH_RADIUS_KM = 6371.0
+
+
+class ChargerStore:
     '''
-    Process the charger map data and return a dataframe
+    Process-wide, columnar view of the charger map data. The data is read from a memory-mapped
+    Arrow snapshot of the JSON file (see data/charger_snapshot.py), falling back to the JSON
+    itself.
+
+    A store is never modified once loaded: when the JSON's modification time changes,
+    get_charger_store() loads a new store, while callers still holding the previous one keep
+    reading consistent (if outdated) data.
+
+    latitude / longitude are contiguous float64 arrays and state, city and charger_type
+    are stored as categorical codes (see the matching *_categories arrays). Row i of
+    every array corresponds to label i of the cleaned dataframe `df`.
     '''
-    # Read file containing location details
-    df = pd.read_json('data/charger_map_data.json')
+    def __init__(self, path=CHARGER_DATA_PATH, snapshot_path=CHARGER_SNAPSHOT_PATH):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self._load()
+
+    def _load(self):
+        # Read the location details, from the snapshot when it can be read or written
+        # Imported here so that pyarrow is only loaded when the data is first needed
+        import pyarrow as pa
+        from data.charger_snapshot import read_charger_json, read_charger_snapshot
+
+        try:
+            df, radians = read_charger_snapshot(self.path, self.snapshot_path)
+        except (OSError, pa.ArrowException):
+            df, radians = read_charger_json(self.path), None
+
+        # Create coords column using lat and lng
+        df["coords"] = list(zip(df["latitude"], df["longitude"]))
+
+        # Columnar arrays used by the vectorised helpers
+        latitude = np.ascontiguousarray(df["latitude"].to_numpy(dtype=np.float64))
+        longitude = np.ascontiguousarray(df["longitude"].to_numpy(dtype=np.float64))
+        columns = {}
+        for column in ("state", "city", "charger_type"):
+            categorical = pd.Categorical(df[column])
+            columns[column] = (np.asarray(categorical.codes), np.asarray(categorical.categories))
+
+        self.df = df
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radians = radians
+        self.state_codes, self.state_categories = columns["state"]
+        self.city_codes, self.city_categories = columns["city"]
+        self.charger_type_codes, self.charger_type_categories = columns["charger_type"]
+        self._spatial_index = None
+        self._latitude_order = None
+
+        # Inverted indices: state / city name -> row positions and bounding box
+        self.state_rows, self.state_bounds = self._build_inverted_index(*columns["state"])
+        self.city_rows, self.city_bounds = self._build_inverted_index(*columns["city"])
+
+    def _build_inverted_index(self, codes, categories):
+        '''
+        Group row positions by categorical code and compute each group's bounding box
+        '''
+        order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes, minlength=len(categories))
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        nonempty = counts > 0
+
+        latitude = self.latitude[order]
+        longitude = self.longitude[order]
+        min_lat = np.minimum.reduceat(latitude, starts[nonempty]).tolist()
+        max_lat = np.maximum.reduceat(latitude, starts[nonempty]).tolist()
+        min_lng = np.minimum.reduceat(longitude, starts[nonempty]).tolist()
+        max_lng = np.maximum.reduceat(longitude, starts[nonempty]).tolist()
+
+        rows = {}
+        bounds = {}
+        for i, (name, start, count) in enumerate(zip(categories[nonempty], starts[nonempty], counts[nonempty])):
+            rows[name] = order[start:start + count]
+            bounds[name] = ((min_lat[i], min_lng[i]), (max_lat[i], max_lng[i]))
+        return rows, bounds
+
+    def rows_for(self, names, level="city"):
+        '''
+        Return the sorted row positions of the chargers in the given cities (or states)
+        '''
+        index = self.city_rows if level == "city" else self.state_rows
+        selected = [index[name] for name in names if name in index]
+        if not selected:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(selected))
+
+    def bounds_for(self, names, level="city"):
+        '''
+        Return the ((south, west), (north, east)) box covering the given cities (or states),
+        or None if none of them have chargers
+        '''
+        index = self.city_bounds if level == "city" else self.state_bounds
+        boxes = [index[name] for name in names if name in index]
+        if not boxes:
+            return None
+        return (
+            (min(box[0][0] for box in boxes), min(box[0][1] for box in boxes)),
+            (max(box[1][0] for box in boxes), max(box[1][1] for box in boxes)),
+        )
 
-    # If latitude and longitude are not present or empty string, drop the row
-    df = df.dropna(subset=["latitude", "longitude"])
-    df = df[df["latitude"] != ""]
-    df = df[df["longitude"] != ""]
+    def rows_in_bounds(self, bounds, rows=None):
+        '''
+        Return the sorted row positions of the chargers inside the ((south, west), (north, east))
+        box, optionally only those among rows. The box may cross the antimeridian (west > east).
+        '''
+        # Rows sorted by latitude, built on first use
+        if self._latitude_order is None:
+            order = np.argsort(self.latitude, kind="stable")
+            self._latitude_order = (order, self.latitude[order])
+        order, sorted_latitude = self._latitude_order
+
+        (south, west), (north, east) = bounds
+        start = np.searchsorted(sorted_latitude, south, side="left")
+        stop = np.searchsorted(sorted_latitude, north, side="right")
+        candidates = order[start:stop]
+        longitude = self.longitude[candidates]
+        if west <= east:
+            candidates = candidates[(longitude >= west) & (longitude <= east)]
+        else:
+            candidates = candidates[(longitude >= west) | (longitude <= east)]
+        candidates = np.sort(candidates)
+        if rows is not None:
+            candidates = candidates[np.isin(candidates, rows, assume_unique=True)]
+        return candidates
+
+    @property
+    def spatial_index(self):
+        '''
+        SpatialIndex over the charger coordinates, built on first use
+        '''
+        if self._spatial_index is None:
+            self._spatial_index = SpatialIndex(self.latitude, self.longitude, self.radians)
+        return self._spatial_index
+
+    @property
+    def nbytes(self):
+        '''
+        Approximate memory held by the loaded data
+        '''
+        arrays = [self.latitude, self.longitude, self.state_codes, self.city_codes, self.charger_type_codes]
+        return estimate_size(self.df) + sum(array.nbytes for array in arrays)
+
+    def __len__(self):
+        return len(self.latitude)
+
+
+# Keyed by the data's modification time, so a changed file loads a new store. Results derived
+# from the replaced store are stale once it is evicted.
+resources.register("charger_store", lambda mtime: ChargerStore(), max_entries=1,
+                   on_evict=lambda store: resources.invalidate_dependents("charger_store"))
+
+
+def get_charger_store():
+    '''
+    Return the shared ChargerStore, loading it again when the data file changed.
+    Keep using the returned store for the whole computation rather than calling this again,
+    so that row positions and the dataframe always come from the same load.
+    '''
+    # Deployments may ship only the snapshot
+    path = CHARGER_DATA_PATH if os.path.exists(CHARGER_DATA_PATH) else CHARGER_SNAPSHOT_PATH
+    return resources.get("charger_store", os.path.getmtime(path))
 
-    # Create coords column using lat and lng
-    df["coords"] = list(zip(df["latitude"], df["longitude"]))
 
-    return df
+def process_data():
+    '''
+    Process the charger map data and return a dataframe.
+    The dataframe is shared across the process, so treat it as read-only.
+    '''
+    return get_charger_store().df
 
 
 # -------------------------------------------------- 
 # MAPS HELPERS
 # --------------------------------------------------
 
-def get_coordinates(city_name):
+GEOCODE_CACHE_PATH = 'data/geocode_cache.sqlite3'
+GEOCODE_CACHE_TTL = 30 * 24 * 60 * 60  # seconds
+GEOCODE_CACHE_SIZE = 1024
+GEOCODE_CACHE_ROWS = 100_000
+# Seconds between deletions of expired and excess rows from a persistent cache
+CACHE_PURGE_INTERVAL = 60 * 60
+
+
+class PersistentTTLCache:
     '''
-    Take a city name and return the coordinates of the city
+    Cache of JSON-serialisable values. An in-memory LRU sits in front of an optional
+    SQLite table (when path is given), and entries older than ttl seconds are treated as missing.
+    Expired rows, and the oldest rows beyond max_rows, are deleted from the table when it is
+    opened and then at most every CACHE_PURGE_INTERVAL seconds while writing.
     '''
-    geolocator = Nominatim(user_agent="reverse_geocoding_example")
-    location = geolocator.geocode(city_name, exactly_one=True)
-    if location:
-        latitude = location.latitude
-        longitude = location.longitude
-        return latitude, longitude
-    else:
-        return None
+    def __init__(self, path=None, table="cache", ttl=GEOCODE_CACHE_TTL, maxsize=GEOCODE_CACHE_SIZE,
+                 max_rows=GEOCODE_CACHE_ROWS):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.max_rows = max_rows
+        self.table = table
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_created ON {table} (created)")
+            self._purge()
+            self._db.commit()
+
+    def normalize(self, key):
+        return key
+
+    def decode(self, value):
+        return value
+
+    def _remember(self, key, value, created):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _purge(self):
+        # Called with the lock held (or from __init__), the caller commits
+        now = time.time()
+        self._db.execute(f"DELETE FROM {self.table} WHERE created < ?", (now - self.ttl,))
+        if self.max_rows:
+            self._db.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,),
+            )
+        self._purged = now
+
+    def get(self, key):
+        '''
+        Return the cached value for key, or MISSING if it is not cached
+        '''
+        key = self.normalize(key)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute(f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = (self.decode(json.loads(row[0])), row[1])
+            if entry is None:
+                return MISSING
+            if now - entry[1] > self.ttl:
+                self._memory.pop(key, None)
+                return MISSING
+            self._remember(key, *entry)
+            return entry[0]
+
+    def set_many(self, items):
+        '''
+        Cache every (key, value) pair of items, persisting them in a single transaction
+        '''
+        created = time.time()
+        rows = [(self.normalize(key), value) for key, value in items]
+        with self._lock:
+            if self._db is not None:
+                self._db.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, created) VALUES (?, ?, ?)",
+                    [(key, json.dumps(value), created) for key, value in rows],
+                )
+                if created - self._purged > CACHE_PURGE_INTERVAL:
+                    self._purge()
+                self._db.commit()
+            for key, value in rows:
+                self._remember(key, value, created)
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def close(self):
+        '''
+        Close the SQLite connection, the cache keeps working in memory only
+        '''
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class GeocodeCache(PersistentTTLCache):
+    '''
+    Geocoding results keyed by normalized query string.
+    Failed lookups are cached as None so that they are not retried on every rerun.
+    '''
+    def __init__(self, path=GEOCODE_CACHE_PATH, ttl=GEOCODE_CACHE_TTL, maxsize=GEOCODE_CACHE_SIZE, max_rows=GEOCODE_CACHE_ROWS):
+        super().__init__(path, "geocodes", ttl, maxsize, max_rows)
+
+    def normalize(self, query):
+        return " ".join(str(query).lower().split())
+
+    def decode(self, value):
+        return tuple(value) if value else None
 
-def euclidean_distance(point1, point2):
+
+def create_geolocator():
+    from geopy.geocoders import Nominatim
+
+    return Nominatim(user_agent="reverse_geocoding_example")
+
+
+# The caches are bounded by their maxsize entries rather than bytes and, being pinned, never
+# count toward the memory budget
+resources.register("geocode_cache", GeocodeCache, on_evict=PersistentTTLCache.close, pinned=True)
+resources.register("geolocator", create_geolocator)
+
+
+def get_geocode_cache():
     '''
-    Find Euclidean distance between two points
+    Return the process-wide GeocodeCache
     '''
-    return math.sqrt(sum((float(a) - float(b)) ** 2 for a, b in zip(point1, point2)))
+    return resources.get("geocode_cache")
 
 
-def find_closest_points(x, Y, n):
+def get_geolocator():
     '''
-    Find n closest points to x from list Y
+    Return the shared Nominatim client
     '''
-    distances = []
-    for y in Y:
-        idx = y[0]
-        point = (float(y[1]), float(y[2]))
-        distance = euclidean_distance(x, point)
-        distances.append((idx, distance))
-    
-    # Sort based on distance
-    distances.sort(key = lambda x : x[1])
+    return resources.get("geolocator")
+
 
-    # Get closest points (indices)
-    closest_points = [distance[0] for distance in distances]
+def get_coordinates(city_name, geocode=None):
+    '''
+    Take a city name and return the coordinates of the city
+    '''
+    cache = get_geocode_cache()
+    cached = cache.get(city_name)
+    if cached is not MISSING:
+        return cached
 
-    return closest_points[:n]
+    geocode = geocode or get_geolocator().geocode
+    location = geocode(city_name, exactly_one=True)
+    if location:
+        coordinates = (location.latitude, location.longitude)
+    else:
+        coordinates = None
+    cache.set(city_name, coordinates)
+    return coordinates
 
 
-def find_maps_distance(origin, destination, maps_api_key):
+def prewarm_geocode_cache(names=None):
+    '''
+    Geocode every city in data.charger_data.cities (or the given names) that is not cached yet.
+    Requests are limited to one per second to respect Nominatim's usage policy. Names the geocoder
+    failed on (e.g. it was unavailable or rate limited the run) are not cached and are returned.
+    '''
+    from geopy.exc import GeopyError
+    from geopy.extra.rate_limiter import RateLimiter
+
+    if names is None:
+        names = [city for state_cities in cities.values() for city in state_cities]
+    cache = get_geocode_cache()
+    # Errors are raised rather than turned into None, which would be cached as "not found"
+    geocode = RateLimiter(get_geolocator().geocode, min_delay_seconds=1, swallow_exceptions=False)
+    failed = []
+    for name in names:
+        if cache.get(name) is MISSING:
+            try:
+                get_coordinates(name, geocode=geocode)
+            except GeopyError:
+                failed.append(name)
+    return failed
+
+
+class SpatialIndex:
     '''
-    This function takes in the origin and destination coordinates and returns the distance between them.
+    Ball tree over (latitude, longitude) points using the haversine metric.
+    Queries return row positions and great-circle distances in km.
     '''
-    url = f"https://maps.googleapis.com/maps/api/distancematrix/json?origins={origin}&destinations={destination}&units=metric&key={maps_api_key}"
-    response = requests.get(url).json()
-    return response
+    def __init__(self, latitude, longitude, radians=None):
+        self.size = len(latitude)
+        # Imported here so that scikit-learn is only loaded by the pages that search by location
+        from sklearn.neighbors import BallTree
+
+        if radians is None:
+            radians = np.radians(np.column_stack([latitude, longitude]))
+        self.tree = BallTree(radians, metric="haversine")
+
+    @staticmethod
+    def _to_radians(point):
+        return np.radians(np.asarray(point, dtype=np.float64).reshape(1, 2))
+
+    def query(self, point, k):
+        '''
+        Return the positions and distances (km) of the k points closest to point
+        '''
+        k = min(k, self.size)
+        if k == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        distances, indices = self.tree.query(self._to_radians(point), k=k)
+        return indices[0], distances[0] * EARTH_RADIUS_KM
+
+    def query_radius(self, point, radius):
+        '''
+        Return the positions and distances (km) of the points within radius km of point, closest first
+        '''
+        indices, distances = self.tree.query_radius(
+            self._to_radians(point), r=radius / EARTH_RADIUS_KM, return_distance=True, sort_results=True
+        )
+        return indices[0], distances[0] * EARTH_RADIUS_KM
 
 
-def find_nearest_coordinate(given_coordinate, maps_api_key, n = 5):
+def find_closest_points(x, n):
     '''
-    This function takes in a DataFrame, a given coordinate and returns the details of the
-    coordinates from the DataFrame nearest to the given coordinate. 
+    Find the n chargers closest to x, returning their indices and distances in km
     '''
-    # Get Google Maps API Key
-    maps_api_key = os.environ.get("GOOGLE_API_KEY")
+    return get_charger_store().spatial_index.query(x, n)
 
-    # Create DataFrame by processing the data
-    df = process_data()
 
-    # Get closest 20 points (indices) by Euclidean Distance
-    closest_points = find_closest_points(given_coordinate, list(zip(list(df.index), list(df['latitude']), list(df['longitude']))), 20)
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
 
-    # Convert destination coordinate to string
-    origin = str(given_coordinate[0]) + ',' + str(given_coordinate[1])
 
-    # Values to be returned
-    indices = []
-    addresses = []
-    distances = []
-    durations = []
+def geohash(latitude, longitude, precision):
+    '''
+    Geohash of a point, the cell it falls in at the given precision (number of characters)
+    '''
+    ranges = [[-90.0, 90.0], [-180.0, 180.0]]
+    values = [latitude, longitude]
+    characters = []
+    bit_count = 0
+    character = 0
+    axis = 1  # Geohash interleaves bits starting with longitude
+    while len(characters) < precision:
+        low, high = ranges[axis]
+        middle = (low + high) / 2
+        if values[axis] >= middle:
+            character = character * 2 + 1
+            ranges[axis][0] = middle
+        else:
+            character = character * 2
+            ranges[axis][1] = middle
+        axis = 1 - axis
+        bit_count += 1
+        if bit_count == 5:
+            characters.append(GEOHASH_ALPHABET[character])
+            bit_count = 0
+            character = 0
+    return "".join(characters)
+
+
+def geohash_codes(latitudes, longitudes, precision):
+    '''
+    Vectorised geohash of arrays of points, as integers whose base 32 digits are the geohash characters
+    '''
+    longitude_bits, latitude_bits = (5 * precision + 1) // 2, 5 * precision // 2
+    rows = np.floor((np.asarray(latitudes, dtype=np.float64) + 90) / 180 * 2 ** latitude_bits)
+    columns = np.floor((np.asarray(longitudes, dtype=np.float64) + 180) / 360 * 2 ** longitude_bits)
+    rows = np.clip(rows, 0, 2 ** latitude_bits - 1).astype(np.int64)
+    columns = np.clip(columns, 0, 2 ** longitude_bits - 1).astype(np.int64)
+
+    # Interleave the bits of the column and row, starting with the column's most significant bit
+    codes = np.zeros(rows.shape, dtype=np.int64)
+    for bit in range(5 * precision):
+        if bit % 2 == 0:
+            codes = codes << 1 | columns >> (longitude_bits - 1 - bit // 2) & 1
+        else:
+            codes = codes << 1 | rows >> (latitude_bits - 1 - bit // 2) & 1
+    return codes
 
-    # Get distance and duration from origin to each of the closest points using Google Maps API
-    for point in closest_points:
-        destination = str(df.loc[point]['latitude']) + ',' + str(df.loc[point]['longitude'])
-        response = find_maps_distance(origin, destination, maps_api_key)
 
-        address = "".join(response['destination_addresses'])
-        distance = response['rows'][0]['elements'][0]['distance']['text']
-        duration = response['rows'][0]['elements'][0]['duration']['text']
-        
-        indices.append(point)
-        addresses.append(address)
-        distances.append(distance)
-        durations.append(duration)
+def geohash_cell_bounds(codes, precision):
+    '''
+    South, west, north and east edges of the geohash cells given as integer codes
+    '''
+    longitude_bits, latitude_bits = (5 * precision + 1) // 2, 5 * precision // 2
+    rows = np.zeros(np.shape(codes), dtype=np.int64)
+    columns = np.zeros(np.shape(codes), dtype=np.int64)
+    for bit in range(5 * precision):
+        value = np.asarray(codes) >> (5 * precision - 1 - bit) & 1
+        if bit % 2 == 0:
+            columns = columns << 1 | value
+        else:
+            rows = rows << 1 | value
+
+    height = 180 / 2 ** latitude_bits
+    width = 360 / 2 ** longitude_bits
+    south = rows * height - 90
+    west = columns * width - 180
+    return south, west, south + height, west + width
 
-    return indices[:n], distances[:n], durations[:n], addresses[:n]
 
-def display_city_chargers(city):
+def geohash_strings(codes, precision):
     '''
-    Take a dataframe and city name as input and display the chargers in that city
+    Geohash strings of integer geohash codes
     '''
-    # Create DataFrame by processing the data
-    df = process_data()
+    digits = np.asarray(codes)[:, None] >> np.arange(5 * (precision - 1), -1, -5) & 31
+    alphabet = np.array(list(GEOHASH_ALPHABET))
+    return ["".join(characters) for characters in alphabet[digits].tolist()]
 
-    # Filter the dataframe to only include chargers in the cities
-    df = df[df["city"].isin(city)]
 
-    # If there is only one city, generate a map centered at the city
-    if len(city) == 1:
-        center_coords = get_coordinates(city)
-        zoom_start = 10
-    # If there are multiple cities, generate a map centered at India
-    else:
-        center_coords = (22.845137, 78.672679)
-        zoom_start = 5
-    map = folium.Map(location=center_coords, zoom_start=zoom_start)
-
-    # Visualize the chargers on the map
-    for i, row in df.iterrows():
-        color = color_map[row.charger_type]
-
-        coords_x, coords_y = df.loc[i, "coords"]
-        if coords_x:
-            coords_x = round(float(coords_x), 4)
-        if coords_y:
-            coords_y = round(float(coords_y), 4)
-            folium.Marker(location=df.loc[i, "coords"],
-                          icon=folium.Icon(color=color),
-                          tooltip=df.loc[i, "charger_type"],
-                          popup=df.loc[i, "address"]).add_to(
-                map
-            )
-
-    # Render Folium map in Streamlit
-    return st_folium.st_folium(map, width=725)
+ROUTE_CACHE_PATH = 'data/route_cache.sqlite3'
+ROUTE_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+ROUTE_CACHE_SIZE = 20_000
+ROUTE_CACHE_ROWS = 500_000
+# Geohash precision 7 cells are roughly 150 m x 150 m
+ROUTE_CACHE_PRECISION = 7
 
 
-def display_chargers_by_location(location):
+class RouteCache(PersistentTTLCache):
     '''
-    Take a location as input and display the chargers near that location
+    Distance Matrix results keyed by the geohash cell of the origin and the charger's idx,
+    so that searches from the same neighbourhood reuse each other's routes.
+    Pass path=None to keep the cache in memory only.
     '''
-    # Get Google Maps API Key
-    maps_api_key = os.environ.get("GOOGLE_API_KEY")
-
-    # Create DataFrame by processing the data
-    df = process_data()
-    
-    # Get coordinates of the location
-    given_coordinate = get_coordinates(location)
-
-    # Get nearest chargers
-    indices, distances, durations, addresses = find_nearest_coordinate(
-        given_coordinate, maps_api_key, 
-    )
-
-    display_chargers_df = []
-
-    # Display chargers
-    map = folium.Map(location=given_coordinate, zoom_start=12)
-    i = 0
-    for idx, distance, duration, address in zip(indices, distances, durations, addresses):
-        color = color_map[df.loc[idx, "charger_type"]]
-
-        # Create Popups
-        invisible_character = "⠀"
-        popup_distance = invisible_character.join(distance.split(" "))
-        popup_duration = invisible_character.join(duration.split(" "))
-
-        coords_x, coords_y = df.loc[idx, "coords"]
-        if coords_x:
-            coords_x = round(float(coords_x), 4)
-        if coords_y:
-            coords_y = round(float(coords_y), 4)
-            folium.Marker(location=df.loc[idx, "coords"],
-                          icon=folium.Icon(color=color),
-                          tooltip=df.loc[idx, "charger_type"],
-                          popup=f"{i}\n{popup_distance}\n{popup_duration}").add_to(map)
-        i += 1
-
-        # Add entered location to map in white color
-        folium.Marker(location=given_coordinate,
-                      icon=folium.Icon(color="red"),
-                      tooltip="Entered Location",
-                      popup=location
-                     ).add_to(map)
-
-        
-        # Add values to display_chargers_df
-        display_chargers_df.append({
-            "Distance": distance,
-            "Duration": duration,
-            "Address": address,
-            "Charger Type": df.loc[idx]["charger_type"]
-        })
-        
-    st_folium.st_folium(map, width=725)
-    st.dataframe(pd.DataFrame(display_chargers_df))
-
-
-def cluster_by_distance(points, radius):
-    '''
-    Using points and specified radius, forms clusters based on density
-    '''
-    distances = []
-    n = len(points)
-    for i in range(n):
-        distances.append([])
-        for j in range(i + 1, n):
-            distances[-1].append(haversine(points[i], points[j])) #unit is km
-
-    # visited = [0]*n
-    clusters = []
-    for i in range(n):
-        clusters.append([])
-        count = 0
-        for d in distances[i]:
-            count += 1
-            if d <= radius:
-                clusters[-1].append(points[i+count])
-
-    return clusters
-
-def display_user_requested_chargers():
-    '''
-    Perform clustering on user requested chargers and display the results
-    '''
-    # Read csv file containing user requested chargers
-    df = pd.read_csv("data/user_requested_chargers.csv")
-
-    city_coords = (12.9725881014472, 77.59406890113576)
-    colors = ['red', 'blue', 'green', 'purple', 'orange', 'darkred', 'beige', 'darkblue', 'darkgreen', 'cadetblue', 'darkpurple', 'pink', 'lightblue', 'lightgreen', 'black']
-    n = len(colors)
-
-    coordinates = df.values.tolist()
-
-    st.write("###  Locations requested by users ")
-
-    # Create streamlit columns
-    col1, col2, col3 = st.columns(3)
-
-    with col1:
-        st.write("##### Shown below is a map of user recommended locations that was generated by us for this demonstration.")
-        user_requests_map = folium.Map(location=(12.9725881014472, 77.6406890113576), zoom_start=12, control_scale = True)
-        for latitude, longitude in coordinates:
-            folium.Marker(location=(latitude, longitude), icon=folium.Icon()).add_to(user_requests_map)
-        st_folium.st_folium(user_requests_map, width=725, key="user_requests_map")
-    with col2:
-        st.write("##### Here, you can see the values that we generated.")
-        st.dataframe(df, width=300, height=725)
-    with col3:
-        # Add new value
-        st.write("##### You can add new values to the table below. This will help us improve our algorithm.")
-        new_latitude = st.text_input("Latitude")
-        new_longitude = st.text_input("Longitude")
-        if st.button("Add"):
-            if new_latitude and new_longitude:
-                new_row = pd.DataFrame.from_dict({"latitude": [new_latitude], "longitude": [new_longitude]})
-                df = pd.concat([df, new_row])
-                df.to_csv("user_requested_chargers.csv", index=False)
-                st.success("Added new value")
-                st.experimental_rerun()
-            else:
-                st.error("Please enter both latitude and longitude")
-
-    st.write("### Configuring values for the alogorithm")
-    st.write("##### The user can change these values according to their needs. We have set the default values to the ones that we found to be the most optimal.")
-
-    # Configuration - Input boxes for radius and min samples
-    radius = st.number_input("Radius", min_value=0.1, max_value=10.0, value=0.5, step=0.1)
-    min_samples = st.number_input("Minimum Samples", min_value=5, max_value=50, value=15, step=5)
-
-
-    st.write("### Clusters formed based on distances (Conventional Clustering)")
-    st.write("##### Since the earth is curved, Euclidean distance is not the most appropriate. So, we have computed Haversine distance, that takes into account the curvature of the earth to find distances between all the points. Using this we have used a conventional clustering algorithm to form clusters.")
-
-    clusters_1 = [x for x in cluster_by_distance(coordinates.copy(), radius) if len(x) >= min_samples]
-    distance_based_clusters_map = folium.Map(location=city_coords, zoom_start=12)
-    for i in range(len(clusters_1)):
-        cluster = clusters_1[i]
-        color = colors[i % n]
-        for point in cluster:
-            x, y = point[0], point[1]
-            folium.Marker(location= (x, y), icon=folium.Icon(color=color)).add_to(distance_based_clusters_map)
-
-    st_folium.st_folium(distance_based_clusters_map, width=725, key="distance_based_clusters_map")
-
-    st.write("### Clusters formed based on densities (DBSCAN Algorithm)")
-    st.write("##### As you saw, the results of the conventional clustering algorithm were not that great. To improve on this, we used the DBSCAN algorithm to construct better clusters.")
-    st.warning("Note: The grey markers don't belong to any cluster.")
-
-    epsilon = 0.5 / 6371.0
-    db = DBSCAN(eps=epsilon, min_samples=min_samples, algorithm='ball_tree', metric='haversine').fit(np.radians(df.to_numpy()))
-    labels = db.labels_
-    density_based_clusters_map = folium.Map(location=city_coords, zoom_start=12, control_scale = True)
-    for i in range(len(labels)):
-        if labels[i] == -1:
-            color = 'lightgray'
-            folium.Marker(location= coordinates[i], icon=folium.Icon(color=color)).add_to(density_based_clusters_map)
+    def __init__(self, path=ROUTE_CACHE_PATH, precision=ROUTE_CACHE_PRECISION, ttl=ROUTE_CACHE_TTL, maxsize=ROUTE_CACHE_SIZE,
+                 max_rows=ROUTE_CACHE_ROWS):
+        super().__init__(path, "routes", ttl, maxsize, max_rows)
+        self.precision = precision
 
-        else:
-            color = colors[labels[i] % n]
-            folium.Marker(location= coordinates[i], icon=folium.Icon(color=color)).add_to(density_based_clusters_map)
-    
-    st_folium.st_folium(density_based_clusters_map, width=725, key="density_based_clusters_map")
+    def decode(self, value):
+        return tuple(value)
 
+    def route_key(self, origin, charger_id):
+        return f"{geohash(origin[0], origin[1], self.precision)}/{charger_id}"
 
-    st.write("### Final Result - Removing points not part of any cluster")
-    st.write("##### After removing the points that don't belong to any cluster we obtain this final result. This can be used by EV charger companies to place their chargers in optimal locations.")
+    def get_route(self, origin, charger_id):
+        '''
+        Return the cached (address, distance, duration) from origin's cell to the charger, or MISSING
+        '''
+        return self.get(self.route_key(origin, charger_id))
 
-    density_based_clusters_map_1 = folium.Map(location=city_coords, zoom_start=12, control_scale = True)
-    for i in range(len(labels)):
-        if labels[i] == -1:
-            continue
+    def set_routes(self, origin, routes):
+        '''
+        Cache a {charger_id: (address, distance, duration)} mapping of routes from origin
+        '''
+        self.set_many([(self.route_key(origin, charger_id), list(route)) for charger_id, route in routes.items()])
 
-        else:
-            color = colors[labels[i] % n]
-            folium.Marker(location= coordinates[i], icon=folium.Icon(color=color)).add_to(density_based_clusters_map_1)
-    
-    st_folium.st_folium(density_based_clusters_map_1, width=725, key="density_based_clusters_map")
 
+resources.register("route_cache", RouteCache, on_evict=PersistentTTLCache.close, pinned=True)
 
-def st_filter_template(df, attribute, default_all=False):
+
+def get_route_cache():
     '''
-    Streamlit filter template
+    Return the process-wide RouteCache
     '''
-    container = st.container()
-    all = st.checkbox(f"Select all {attribute}", value=default_all)
-    values = list(df[attribute].unique().sort())
-
-    if all:
-        selected_options = container.multiselect(
-            "Select one or more options:", values, values
-        )
-    else:
-        selected_options = container.multiselect("Select one or more options:", values)
-    return selected_options
-
-
-def display_charger_consumption_data():
-    '''
-    Display an artificially charger consumption dataset with filter and pivot table functionality
-    '''
-    data = pl.read_csv("data/charger_consumption_data.csv")
-
-    # Drop the first column
-    data = data.drop("")
-
-    # Hide Columns
-    hide_columns = st.multiselect("Choose columns to hide", data.columns, default=[])
-
-    # Filter Columns
-    # TODO: Add support for datatypes other than categorical
-    filter_columns = st.multiselect(
-        "Choose columns to filter", data.columns, default=[]
-    )
-    filters = {}
-    for column in filter_columns:
-        filters[column] = st_filter_template(data, column)
-    for column, values in filters.items():
-        data = data.filter(pl.col(column).is_in(values))
-
-    data = data.drop(hide_columns).to_pandas()
-    st.dataframe(data)
-
-    # Add a column having values just 1
-    data["count"] = 1
-
-    # Pivot Table
-    st.write("### Pivot Table")
-    st.write("##### Users can create pivot tables according to their needs by selecting the index, values, columns and aggregation function.")
-    st.write("##### For example, if you want to see the average uptime of each chargers with rating type 2, you can select the index as charger_type, values as uptime, columns as type_2_rating and aggregation function as mean.")
-    pivot = {"index": "charger_type", "values": [], "columns": [], "aggfunc": ""}
-    pivot["values"] = st.multiselect("Choose values", data.columns, default=["daily_usage_2"])
-    pivot["columns"] = st.multiselect("Choose columns", data.columns, default=["type_2_rating"])
-    pivot["aggfunc"] = st.selectbox("Choose aggregation function", ["mean", "sum"], index=0)
-    if pivot["index"] and pivot["values"] and pivot["columns"]:
-        st.dataframe(
-            pd.pivot_table(
-                data,
-                index=pivot["index"],
-                values=pivot["values"],
-                columns=pivot["columns"],
-                aggfunc=pivot["aggfunc"],
-            )
-        )
+    return resources.get("route_cache")
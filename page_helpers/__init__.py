@@ -0,0 +1,4 @@
+'''
+Helpers for the individual pages of the app. Each page only imports its own module, so
+heavy dependencies such as scikit-learn, polars and httpx are loaded by the pages that use them.
+'''
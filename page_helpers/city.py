@@ -0,0 +1,131 @@
+import math
+
+import folium
+import streamlit as st
+import streamlit_folium as st_folium
+
+from data.charger_data import cities
+from helper_functions import get_charger_store, resources
+from page_helpers.maps import (MARKER_CLUSTER_THRESHOLD, add_charger_markers, add_grid_counts, add_heatmap_layer,
+                               get_heatmap_zoom_levels)
+
+MAP_WIDTH = 725
+MAP_HEIGHT = 700
+
+# Selections with more chargers than this only send the chargers in view to the browser
+VIEWPORT_QUERY_THRESHOLD = 1000
+# In that mode markers are shown from this zoom level on, as long as there are at most
+# VIEWPORT_MAX_MARKERS chargers in view. Otherwise the chargers in view are counted per grid cell.
+VIEWPORT_MARKER_ZOOM = 11
+VIEWPORT_MAX_MARKERS = 500
+# Fraction of the view's size also queried on every side, so short pans already have their markers
+VIEWPORT_PADDING = 0.25
+
+
+resources.register("city_choices", lambda *state_choices: [city for state in state_choices for city in cities[state]],
+                   max_entries=128)
+
+
+def get_city_choices(state_choices):
+    '''
+    Return the cities of the given states in the order they are listed
+    '''
+    return resources.get("city_choices", *state_choices)
+
+
+def fit_zoom(bounds, width=MAP_WIDTH, height=MAP_HEIGHT, max_zoom=14):
+    '''
+    Zoom level that Leaflet picks to fit the ((south, west), (north, east)) box on a width x height map
+    '''
+    (south, west), (north, east) = bounds
+    zooms = [max_zoom]
+    if east > west:
+        zooms.append(math.log2(width * 360 / (256 * (east - west))))
+    if north > south:
+        # Latitude span in Web Mercator units, where the whole world is 2 pi high
+        mercator = lambda latitude: math.log(math.tan(math.pi / 4 + math.radians(latitude) / 2))
+        zooms.append(math.log2(height * 2 * math.pi / (256 * (mercator(north) - mercator(south)))))
+    return max(0, math.floor(min(zooms)))
+
+
+def get_viewport(key, default_bounds, default_zoom):
+    '''
+    Return the bounds and zoom of the map last reported by the st_folium component with the given key,
+    or the defaults until the browser has reported them
+    '''
+    value = st.session_state.get(key) or {}
+    bounds = value.get("bounds") or {}
+    south_west = bounds.get("_southWest") or {}
+    north_east = bounds.get("_northEast") or {}
+    reported = (south_west.get("lat"), south_west.get("lng"), north_east.get("lat"), north_east.get("lng"), value.get("zoom"))
+    if None in reported:
+        return default_bounds, default_zoom
+    south, west, north, east, zoom = reported
+    return ((south, west), (north, east)), zoom
+
+
+def pad_bounds(bounds, padding=VIEWPORT_PADDING):
+    '''
+    Grow the box by padding times its size on every side, wrapping the longitudes into [-180, 180]
+    '''
+    (south, west), (north, east) = bounds
+    latitude_padding = (north - south) * padding
+    longitude_padding = (east - west) * padding
+    south, north = max(south - latitude_padding, -90), min(north + latitude_padding, 90)
+    west, east = west - longitude_padding, east + longitude_padding
+    if east - west >= 360:
+        return (south, -180), (north, 180)
+    return (south, (west + 180) % 360 - 180), (north, (east + 180) % 360 - 180)
+
+
+def display_city_chargers(city, cluster_threshold=MARKER_CLUSTER_THRESHOLD, viewport=None):
+    '''
+    Take a list of city names as input and display the chargers in those cities.
+    With viewport (by default when there are more than VIEWPORT_QUERY_THRESHOLD chargers) only the
+    chargers around the part of the map in view are sent, as markers or, when zoomed out, as counts per grid cell.
+    '''
+    store = get_charger_store()
+    rows = store.rows_for(city)
+    if viewport is None:
+        viewport = len(rows) > VIEWPORT_QUERY_THRESHOLD
+
+    # Fit the map to the chargers in the selected cities,
+    # falling back to a map centered at India if there are none
+    bounds = store.bounds_for(city)
+    if bounds:
+        center_coords = ((bounds[0][0] + bounds[1][0]) / 2, (bounds[0][1] + bounds[1][1]) / 2)
+        zoom_start = 10
+    else:
+        center_coords = (22.845137, 78.672679)
+        zoom_start = 5
+    map = folium.Map(location=center_coords, zoom_start=zoom_start)
+    if bounds:
+        map.fit_bounds(bounds, max_zoom=14)
+
+    # Traffic heatmap overlay, off until the user enables it
+    if get_heatmap_zoom_levels():
+        add_heatmap_layer(map, show=False)
+        folium.LayerControl().add_to(map)
+
+    if not viewport or not bounds:
+        # Visualize the chargers on the map
+        add_charger_markers(map, store.df.take(rows), cluster_threshold)
+
+        # Render Folium map in Streamlit
+        return st_folium.st_folium(map, width=MAP_WIDTH)
+
+    # The base map only depends on the selection, so panning and zooming reruns the page with the
+    # new view and only the chargers layer is replaced in the browser. Keying the component by the
+    # selection starts every selection from its own fitted view.
+    key = "city_chargers_map_" + "|".join(city)
+    view_bounds, zoom = get_viewport(key, bounds, fit_zoom(bounds))
+    visible = store.rows_in_bounds(pad_bounds(view_bounds), rows)
+
+    chargers = folium.FeatureGroup(name="Chargers")
+    if zoom >= VIEWPORT_MARKER_ZOOM and len(visible) <= VIEWPORT_MAX_MARKERS:
+        add_charger_markers(chargers, store.df.take(visible), cluster_threshold)
+    else:
+        add_grid_counts(chargers, store.latitude[visible], store.longitude[visible], zoom)
+
+    return st_folium.st_folium(map, width=MAP_WIDTH, height=MAP_HEIGHT, key=key,
+                               returned_objects=["bounds", "zoom"], feature_group_to_add=chargers)
@@ -0,0 +1,196 @@
+import inspect
+import os
+
+import streamlit as st
+import polars as pl
+
+from helper_functions import resources
+
+CONSUMPTION_DATA_PATH = "data/charger_consumption_data.csv"
+CONSUMPTION_PARQUET_PATH = "data/charger_consumption_data.parquet"
+
+
+def lazy_columns(frame):
+    '''
+    Column names of a polars LazyFrame without collecting it
+    '''
+    if hasattr(frame, "collect_schema"):
+        return frame.collect_schema().names()
+    return frame.columns
+
+
+def group_by(frame, keys):
+    '''
+    polars renamed groupby to group_by in 0.19, support both
+    '''
+    if hasattr(frame, "group_by"):
+        return frame.group_by(keys, maintain_order=True)
+    return frame.groupby(keys, maintain_order=True)
+
+
+def pivot(frame, values, index, columns):
+    '''
+    polars renamed the pivot columns argument to on in 1.0, support both
+    '''
+    if "on" in inspect.signature(frame.pivot).parameters:
+        return frame.pivot(on=columns, index=index, values=values, aggregate_function="first")
+    return frame.pivot(values=values, index=index, columns=columns, aggregate_function="first")
+
+
+PIVOT_AGGREGATIONS = {
+    "mean": lambda column: pl.col(column).mean(),
+    "sum": lambda column: pl.col(column).sum(),
+    "count": lambda column: pl.col(column).count(),
+    "min": lambda column: pl.col(column).min(),
+    "max": lambda column: pl.col(column).max(),
+    "median": lambda column: pl.col(column).median(),
+    "p95": lambda column: pl.col(column).quantile(0.95, interpolation="linear"),
+}
+
+PIVOT_LABEL = "__pivot_label"
+
+
+def aggregate_pivot(frame, index, values, columns, aggfuncs):
+    '''
+    Group frame by the pivot index and columns, computing every aggregation of every
+    value in a single (multi-threaded) group-by pass
+    '''
+    keys = [index] + columns
+    label = pl.concat_str(
+        [pl.lit(f"{column}=") + pl.col(column).cast(pl.Utf8) for column in columns], separator=", "
+    )
+    return (
+        group_by(frame, keys)
+        .agg([PIVOT_AGGREGATIONS[aggfunc](value).alias(f"{aggfunc}({value})") for value in values for aggfunc in aggfuncs])
+        .sort(keys)
+        .with_columns(label.alias(PIVOT_LABEL))
+    )
+
+
+def spread_pivot(aggregated, index, columns):
+    '''
+    Spread the output of aggregate_pivot into a pivot table with one row per index value
+    and one "<aggfunc>(<value>) | <column>=<value>, ..." column per cell
+    '''
+    names = [name for name in aggregated.columns if name not in [index, PIVOT_LABEL] + columns]
+    labels = aggregated.select(columns + [PIVOT_LABEL]).unique().sort(columns)[PIVOT_LABEL].to_list()
+
+    table = aggregated.select(pl.col(index).unique(maintain_order=True))
+    for name in names:
+        wide = pivot(aggregated, name, index, PIVOT_LABEL)
+        ordered = [label for label in labels if label in wide.columns]
+        table = table.join(
+            wide.select([pl.col(index)] + [pl.col(label).alias(f"{name} | {label}") for label in ordered]),
+            on=index,
+            how="left",
+        )
+    return table
+
+
+def scan_consumption_data(path=CONSUMPTION_DATA_PATH, parquet_path=CONSUMPTION_PARQUET_PATH):
+    '''
+    Return a LazyFrame over the charger consumption data. Queries run against a Parquet
+    copy of the csv, which is rewritten whenever the csv is newer than it. When the copy
+    can't be written (e.g. a read-only deployment) the csv is scanned directly.
+    '''
+    if not os.path.exists(parquet_path) or os.path.getmtime(parquet_path) < os.path.getmtime(path):
+        temporary_path = f"{parquet_path}.{os.getpid()}.tmp"
+        try:
+            pl.read_csv(path).write_parquet(temporary_path)
+            os.replace(temporary_path, parquet_path)
+        except OSError:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            # Drop the first column
+            return pl.scan_csv(path).drop("")
+
+    # Drop the first column
+    return pl.scan_parquet(parquet_path).drop("")
+
+
+def unique_values(frame, column):
+    '''
+    Sorted distinct values of a column of a LazyFrame
+    '''
+    return frame.select(pl.col(column).unique().sort()).collect().to_series().to_list()
+
+
+# Entries are keyed by the csv's modification time, so edits to it are picked up
+resources.register("consumption_data", lambda mtime: scan_consumption_data(), max_entries=1)
+resources.register("consumption_values", lambda mtime, column: unique_values(resources.get("consumption_data", mtime), column),
+                   max_entries=64, depends_on=("consumption_data",))
+# Collected tables of a session's filters and pivot, reused while the user interacts with other widgets
+resources.register("consumption_results", budget=64 * 1024 ** 2, max_entries=4, depends_on=("consumption_data",), session=True)
+
+
+def st_filter_template(values, attribute, default_all=False):
+    '''
+    Streamlit filter template
+    '''
+    container = st.container()
+    all = st.checkbox(f"Select all {attribute}", value=default_all)
+
+    if all:
+        selected_options = container.multiselect(
+            "Select one or more options:", values, values
+        )
+    else:
+        selected_options = container.multiselect("Select one or more options:", values)
+    return selected_options
+
+
+def display_charger_consumption_data():
+    '''
+    Display an artificially charger consumption dataset with filter and pivot table functionality.
+    Filters, hidden columns and the pivot aggregation are built into lazy queries that are collected together.
+    '''
+    mtime = os.path.getmtime(CONSUMPTION_DATA_PATH)
+    source = resources.get("consumption_data", mtime)
+    columns = lazy_columns(source)
+
+    # Hide Columns
+    hide_columns = st.multiselect("Choose columns to hide", columns, default=[])
+
+    # Filter Columns
+    # TODO: Add support for datatypes other than categorical
+    filter_columns = st.multiselect(
+        "Choose columns to filter", columns, default=[]
+    )
+    filters = {}
+    for column in filter_columns:
+        filters[column] = st_filter_template(resources.get("consumption_values", mtime, column), column)
+    data = source
+    for column, values in filters.items():
+        data = data.filter(pl.col(column).is_in(values))
+
+    data = data.drop(hide_columns)
+    table = st.empty()
+
+    # Add a column having values just 1
+    pivot_data = data.with_columns(pl.lit(1, dtype=pl.Int64).alias("count"))
+    pivot_columns = [column for column in columns if column not in hide_columns] + ["count"]
+
+    # Pivot Table
+    st.write("### Pivot Table")
+    st.write("##### Users can create pivot tables according to their needs by selecting the index, values, columns and aggregation function.")
+    st.write("##### For example, if you want to see the average uptime of each chargers with rating type 2, you can select the index as charger_type, values as uptime, columns as type_2_rating and aggregation function as mean.")
+    pivot = {"index": "charger_type", "values": [], "columns": [], "aggfunc": []}
+    pivot["values"] = st.multiselect("Choose values", pivot_columns, default=["daily_usage_2"])
+    pivot["columns"] = st.multiselect("Choose columns", pivot_columns, default=["type_2_rating"])
+    pivot["aggfunc"] = st.multiselect("Choose aggregation functions", list(PIVOT_AGGREGATIONS), default=["mean"])
+
+    queries = [data]
+    keys = [pivot["index"]] + pivot["columns"]
+    values = [value for value in pivot["values"] if value not in keys]
+    if pivot["index"] and values and pivot["columns"] and pivot["aggfunc"]:
+        queries.append(aggregate_pivot(pivot_data, pivot["index"], values, pivot["columns"], pivot["aggfunc"]))
+
+    key = (
+        mtime, tuple(hide_columns), tuple((column, tuple(selected)) for column, selected in filters.items()),
+        pivot["index"], tuple(values), tuple(pivot["columns"]), tuple(pivot["aggfunc"]),
+    )
+    results = resources.get("consumption_results", *key, factory=lambda: pl.collect_all(queries))
+    table.dataframe(results[0].to_arrow())
+
+    if len(results) > 1:
+        st.dataframe(spread_pivot(results[1], pivot["index"], pivot["columns"]).to_arrow())
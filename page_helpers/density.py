@@ -0,0 +1,125 @@
+import folium
+import numpy as np
+import pandas as pd
+import streamlit as st
+import streamlit_folium as st_folium
+
+from branca.colormap import linear
+
+from helper_functions import get_charger_store, geohash_cell_bounds, geohash_codes, geohash_strings, resources
+
+# Cell sizes offered to the user -> geohash precision (characters)
+DENSITY_CELL_SIZES = {"~40 km": 4, "~5 km": 5, "~1 km": 6}
+# Bytes of GeoJSON layers kept for the cell size / charger type selections that sessions asked for
+DENSITY_GEOJSON_BUDGET = 64 * 1024 ** 2
+# Columns of a density table before the per charger type counts
+DENSITY_COLUMNS = ["geohash", "south", "west", "north", "east", "total"]
+
+
+def compute_density(precision, charger_types=()):
+    '''
+    Count the chargers of the given types (all of them if empty) in every geohash cell of the
+    given precision. Returns one row per non-empty cell with its geohash, bounds, total and
+    a column of counts per charger type.
+    '''
+    store = get_charger_store()
+    type_codes = store.charger_type_codes
+    if charger_types:
+        selected = np.isin(type_codes, np.flatnonzero(np.isin(store.charger_type_categories, charger_types)))
+    else:
+        selected = np.ones(len(store), dtype=bool)
+
+    # Group the chargers by cell, then by cell and charger type with a single bincount
+    codes = geohash_codes(store.latitude[selected], store.longitude[selected], precision)
+    cells, inverse = np.unique(codes, return_inverse=True)
+    type_count = len(store.charger_type_categories)
+    counts = np.bincount(inverse.reshape(-1) * type_count + type_codes[selected], minlength=len(cells) * type_count)
+    counts = counts.reshape(len(cells), type_count)
+
+    south, west, north, east = geohash_cell_bounds(cells, precision)
+    density = pd.DataFrame({
+        "geohash": geohash_strings(cells, precision),
+        "south": south, "west": west, "north": north, "east": east,
+        "total": counts.sum(axis=1),
+    })
+    present = counts.any(axis=0)
+    by_type = pd.DataFrame(counts[:, present], columns=store.charger_type_categories[present])
+    return pd.concat([density, by_type], axis=1)
+
+
+def density_geojson(density):
+    '''
+    GeoJSON FeatureCollection with a rectangle per cell of the density table, whose properties hold
+    the cell's geohash, total and a description of its chargers by type
+    '''
+    type_columns = density.columns[len(DENSITY_COLUMNS):]
+    by_type = density[type_columns].to_numpy()
+    features = []
+    for i, (geohash, south, west, north, east, total) in enumerate(density[DENSITY_COLUMNS].itertuples(index=False)):
+        order = np.argsort(-by_type[i], kind="stable")
+        chargers = ", ".join(f"{type_columns[j]}: {by_type[i, j]}" for j in order if by_type[i, j])
+        features.append({
+            "type": "Feature",
+            "id": geohash,
+            "properties": {"geohash": geohash, "total": int(total), "chargers": chargers},
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[west, south], [east, south], [east, north], [west, north], [west, south]]],
+            },
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+resources.register("charger_density", compute_density, max_entries=32, depends_on=("charger_store",))
+resources.register("charger_density_geojson", lambda precision, charger_types: density_geojson(
+    resources.get("charger_density", precision, charger_types)), budget=DENSITY_GEOJSON_BUDGET, depends_on=("charger_density",))
+
+
+def add_density_layer(map, precision, charger_types=()):
+    '''
+    Add the charger density as a single choropleth layer of geohash cells, with its legend
+    '''
+    charger_types = tuple(sorted(charger_types))
+    density = resources.get("charger_density", precision, charger_types)
+    if density.empty:
+        return map
+    geojson = resources.get("charger_density_geojson", precision, charger_types)
+
+    # Counts are very skewed, so the colour steps are spaced logarithmically
+    highest = max(int(density["total"].max()), 10)
+    index = sorted(set(np.geomspace(1, highest, 7).round().tolist()))
+    colormap = linear.YlOrRd_09.to_step(index=index)
+    colormap.caption = "Chargers per cell"
+
+    folium.GeoJson(
+        geojson,
+        name="Charger density",
+        style_function=lambda feature: {
+            "fillColor": colormap(feature["properties"]["total"]),
+            "fillOpacity": 0.7,
+            "color": "#555555",
+            "weight": 0.5,
+        },
+        tooltip=folium.GeoJsonTooltip(fields=["total", "chargers"], aliases=["Chargers", "By type"]),
+    ).add_to(map)
+    colormap.add_to(map)
+    return map
+
+
+def display_charger_density():
+    '''
+    Display the number of chargers per map cell, for the cell size and charger types chosen by the user
+    '''
+    store = get_charger_store()
+
+    col1, col2 = st.columns(2)
+    with col1:
+        cell_size = st.select_slider("Cell size", list(DENSITY_CELL_SIZES), value="~5 km")
+    with col2:
+        charger_types = st.multiselect("Charger types (all if none are chosen)", store.charger_type_categories.tolist())
+
+    map = folium.Map(location=(22.845137, 78.672679), zoom_start=5)
+    add_density_layer(map, DENSITY_CELL_SIZES[cell_size], charger_types)
+
+    # Nothing is returned, so panning the map does not rerun the page
+    return st_folium.st_folium(map, width=725, key="charger_density_map", returned_objects=[])
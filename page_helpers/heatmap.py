@@ -0,0 +1,81 @@
+import os
+
+import folium
+import streamlit as st
+import streamlit_folium as st_folium
+
+from helper_functions import resources
+from page_helpers.maps import HEATMAP_IMAGE_PATH, add_heatmap_layer, get_heatmap_zoom_levels
+
+
+def display_heatmap_map(key, width=1080):
+    '''
+    Display the traffic heatmap as tiles over an interactive map, so the browser only fetches
+    the tiles in view. Falls back to the full size image when the tiles have not been generated.
+    '''
+    if not get_heatmap_zoom_levels():
+        st.image(HEATMAP_IMAGE_PATH, caption="Heatmap Imposed on Map", width=width)
+        return
+
+    heatmap_map = folium.Map(location=(12.9725881014472, 77.59406890113576), zoom_start=12, control_scale=True)
+    add_heatmap_layer(heatmap_map)
+    st_folium.st_folium(heatmap_map, width=width, key=key)
+
+
+TRAFFIC_CUBE_PATH = 'generation_code/heatmap/traffic_cube.npy'
+TRAFFIC_CUBE_INDEX_PATH = 'generation_code/heatmap/traffic_cube.json'
+
+# Bytes of heatmaps kept for the day / hour selections that sessions asked for
+TRAFFIC_HEATMAP_BUDGET = 256 * 1024 ** 2
+
+
+def load_traffic_cube(cube_mtime, index_mtime):
+    # Imported here so that OpenCV is only loaded by the heatmap page
+    from generation_code.heatmap.generate_heatmap import TrafficCube
+
+    return TrafficCube(TRAFFIC_CUBE_PATH, TRAFFIC_CUBE_INDEX_PATH)
+
+
+resources.register("traffic_cube", load_traffic_cube, max_entries=1)
+resources.register("traffic_heatmap", budget=TRAFFIC_HEATMAP_BUDGET)
+
+
+def get_traffic_cube():
+    '''
+    Return the memory-mapped traffic cube built by generate_heatmap.py, or None if it has not been built.
+    The cube is loaded again when generate_heatmap.py rewrites it.
+    '''
+    if not (os.path.exists(TRAFFIC_CUBE_PATH) and os.path.exists(TRAFFIC_CUBE_INDEX_PATH)):
+        return None
+    return resources.get("traffic_cube", os.path.getmtime(TRAFFIC_CUBE_PATH), os.path.getmtime(TRAFFIC_CUBE_INDEX_PATH))
+
+
+def display_traffic_heatmap_by_time():
+    '''
+    Display the heatmap for the days and hours chosen by the user, computed from the traffic cube
+    '''
+    cube = get_traffic_cube()
+    if cube is None:
+        st.info("Run generation_code/heatmap/generate_heatmap.py to build the traffic cube used by this view.")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        days = st.multiselect("Choose days", cube.days, default=cube.days[:5])
+    with col2:
+        hours = st.multiselect("Choose hours", cube.hours, default=cube.hours)
+
+    if not days or not hours:
+        st.warning("Choose at least one day and one hour to show the heatmap")
+        return
+
+    try:
+        # Shared by every session, keyed by the cube file so a rebuilt cube is not mixed with old heatmaps
+        heatmap = resources.get(
+            "traffic_heatmap", os.path.getmtime(TRAFFIC_CUBE_PATH), tuple(days), tuple(hours),
+            factory=lambda: cube.heatmap(days, hours),
+        )
+    except ValueError as error:
+        st.warning(str(error))
+        return
+    st.image(heatmap, channels="BGR", caption="Heatmap for the selected days and hours", width=1080)
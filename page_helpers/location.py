@@ -0,0 +1,517 @@
+import asyncio
+import concurrent.futures
+import os
+import threading
+
+import folium
+import httpx
+import requests
+import streamlit as st
+import streamlit_folium as st_folium
+import pandas as pd
+import numpy as np
+
+from data.charger_data import color_map
+from helper_functions import MISSING, resources, get_charger_store, get_geocode_cache, get_route_cache
+
+DISTANCE_MATRIX_URL = os.environ.get(
+    "DISTANCE_MATRIX_URL", "https://maps.googleapis.com/maps/api/distancematrix/json"
+)
+# Distance Matrix accepts at most 25 destinations per request
+DISTANCE_MATRIX_MAX_DESTINATIONS = 25
+# (connect, read) timeouts in seconds
+MAPS_TIMEOUT = (3.05, 10)
+
+def create_maps_session():
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+resources.register("maps_session", create_maps_session, on_evict=requests.Session.close, pinned=True)
+
+
+def get_maps_session():
+    '''
+    Return the process-wide requests.Session used for the Google Maps API, so that
+    connections are pooled and reused across searches
+    '''
+    return resources.get("maps_session")
+
+
+def format_coordinate(coordinate):
+    '''
+    Format a (latitude, longitude) pair the way the Google Maps API expects it
+    '''
+    return f"{coordinate[0]},{coordinate[1]}"
+
+
+def distance_matrix_params(origin, destinations, maps_api_key):
+    '''
+    Query parameters of a Distance Matrix request from the origin to the destinations,
+    all formatted with format_coordinate
+    '''
+    return {
+        "origins": origin,
+        "destinations": "|".join(destinations),
+        "units": "metric",
+        "key": maps_api_key,
+    }
+
+
+def find_maps_distance(origin, destinations, maps_api_key, url=None, session=None):
+    '''
+    This function takes in the origin and one or more destination coordinates and returns
+    the Distance Matrix response for all of them in a single request.
+    '''
+    if isinstance(destinations, str):
+        destinations = [destinations]
+    params = distance_matrix_params(origin, destinations, maps_api_key)
+    session = session or get_maps_session()
+    response = session.get(url or DISTANCE_MATRIX_URL, params=params, timeout=MAPS_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+class DistanceMatrixError(Exception):
+    '''
+    Distance Matrix request that the API rejected, e.g. REQUEST_DENIED for a missing or invalid
+    key or OVER_QUERY_LIMIT
+    '''
+    def __init__(self, status, message=None):
+        super().__init__(f"{status}: {message}" if message else status)
+        self.status = status
+
+
+def parse_distance_matrix(response, points):
+    '''
+    Yield (point, address, distance, duration) for every destination of a single-origin
+    Distance Matrix response, skipping chargers that cannot be reached by road.
+    Raises DistanceMatrixError if the request as a whole failed.
+    '''
+    if response.get('status', 'OK') != 'OK':
+        raise DistanceMatrixError(response['status'], response.get('error_message'))
+    elements = response['rows'][0]['elements']
+    for point, address, element in zip(points, response['destination_addresses'], elements):
+        if element.get('status', 'OK') != 'OK':
+            continue
+        yield point, address, element['distance']['text'], element['duration']['text']
+
+
+ROUTING_BACKEND = os.environ.get("ROUTING_BACKEND", "auto")
+
+
+class RoutingBackend:
+    '''
+    One-to-many road routing. route() yields (point, address, distance, duration) for every
+    reachable destination, like parse_distance_matrix; address is None when the backend
+    does not know it. Results of remote backends are worth caching in the RouteCache.
+    '''
+    name = None
+    remote = False
+
+    def route(self, origin, points, destinations):
+        raise NotImplementedError
+
+
+class GoogleMapsRouting(RoutingBackend):
+    '''
+    Routing through the Google Maps Distance Matrix API
+    '''
+    name = "google"
+    remote = True
+
+    def __init__(self, maps_api_key=None, url=None):
+        self.maps_api_key = maps_api_key
+        self.url = url
+
+    def route(self, origin, points, destinations):
+        maps_api_key = self.maps_api_key or os.environ.get("GOOGLE_API_KEY")
+        origin = format_coordinate(origin)
+        destinations = [format_coordinate(destination) for destination in destinations]
+        for start in range(0, len(destinations), DISTANCE_MATRIX_MAX_DESTINATIONS):
+            end = start + DISTANCE_MATRIX_MAX_DESTINATIONS
+            response = find_maps_distance(origin, destinations[start:end], maps_api_key, url=self.url)
+            yield from parse_distance_matrix(response, points[start:end])
+
+
+class LocalRouting(RoutingBackend):
+    '''
+    Routing over the offline road graph built by routing.py
+    '''
+    name = "local"
+
+    def __init__(self, graph=None):
+        self.graph = graph or get_road_graph()
+
+    def route(self, origin, points, destinations):
+        from routing import format_distance, format_duration
+
+        destinations = [tuple(map(float, destination)) for destination in destinations]
+        if not destinations:
+            return
+        distances, durations = self.graph.route(tuple(map(float, origin)), destinations)
+        for point, distance, duration in zip(points, distances, durations):
+            if np.isfinite(duration):
+                yield point, None, format_distance(distance), format_duration(duration)
+
+
+def load_road_graph():
+    from routing import RoadGraph
+
+    return RoadGraph.load()
+
+
+resources.register("road_graph", load_road_graph)
+
+
+def get_road_graph():
+    '''
+    Return the process-wide RoadGraph, loaded from routing.ROAD_GRAPH_PATH
+    '''
+    return resources.get("road_graph")
+
+
+def get_routing_backend(maps_api_key=None, url=None, name=None):
+    '''
+    Return the routing backend selected by name or the ROUTING_BACKEND environment variable.
+    "auto" uses Google Maps when an API key is available and the offline road graph otherwise.
+    '''
+    from routing import ROAD_GRAPH_PATH
+
+    name = name or ROUTING_BACKEND
+    if name == "auto":
+        has_key = maps_api_key or os.environ.get("GOOGLE_API_KEY")
+        name = "local" if not has_key and os.path.exists(ROAD_GRAPH_PATH) else "google"
+    if name == "local":
+        return LocalRouting()
+    if name == "google":
+        return GoogleMapsRouting(maps_api_key, url)
+    raise ValueError(f"Unknown routing backend {name!r}")
+
+
+def lookup_routes(route_cache, origin, points, charger_ids):
+    '''
+    Split points into {point: (address, distance, duration)} for the routes cached from origin's
+    cell and the list of points that still have to be routed. route_cache may be None.
+    '''
+    routed = {}
+    if route_cache is not None:
+        for point in points:
+            route = route_cache.get_route(origin, charger_ids[point])
+            if route is not MISSING:
+                routed[point] = route
+    return routed, [point for point in points if point not in routed]
+
+
+def collect_routes(results, store):
+    '''
+    {point: (address, distance, duration)} for the (point, address, distance, duration) results of a
+    routing backend, with the charger's own address where the backend did not give one
+    '''
+    return {
+        point: (address or store.df.at[point, "address"], distance, duration)
+        for point, address, distance, duration in results
+    }
+
+
+def store_routes(route_cache, origin, routes, charger_ids):
+    '''
+    Cache the {point: (address, distance, duration)} routes fetched from origin. route_cache may be None.
+    '''
+    if route_cache is not None and routes:
+        route_cache.set_routes(origin, {charger_ids[point]: route for point, route in routes.items()})
+
+
+def find_nearest_coordinate(given_coordinate, maps_api_key=None, n = 5, url=None, backend=None):
+    '''
+    This function takes in a given coordinate and returns the indices, distances, durations
+    and addresses of the n chargers nearest to the given coordinate.
+    '''
+    # Route with Google Maps, or the offline road graph when there is no API key
+    backend = backend or get_routing_backend(maps_api_key, url)
+
+    # One load of the charger data for the whole lookup, so row positions match the dataframe
+    store = get_charger_store()
+    charger_ids = store.df["idx"].to_numpy()
+
+    # Get closest 20 points (indices) by great-circle distance
+    closest_points, _ = store.spatial_index.query(given_coordinate, 20)
+
+    # Reuse routes already fetched from the same origin cell, only the rest go to the API
+    route_cache = get_route_cache() if backend.remote else None
+    routed, missing = lookup_routes(route_cache, given_coordinate, closest_points, charger_ids)
+
+    # Get distance and duration from origin to all of the uncached points
+    destinations = [store.df.at[point, "coords"] for point in missing]
+    fetched = collect_routes(backend.route(given_coordinate, missing, destinations), store)
+    store_routes(route_cache, given_coordinate, fetched, charger_ids)
+    routed.update(fetched)
+
+    # Values to be returned
+    indices = [point for point in closest_points if point in routed][:n]
+    addresses = [routed[point][0] for point in indices]
+    distances = [routed[point][1] for point in indices]
+    durations = [routed[point][2] for point in indices]
+
+    return indices, distances, durations, addresses
+
+NOMINATIM_SEARCH_URL = "https://nominatim.openstreetmap.org/search"
+NOMINATIM_USER_AGENT = "reverse_geocoding_example"
+# Candidates are routed in small concurrent batches so that slow batches can be dropped
+ROUTING_BATCH_SIZE = 5
+# Seconds to wait for routing before answering with whatever has arrived
+ROUTING_TIMEOUT = 3.0
+# Seconds allowed for a whole search, including geocoding
+SEARCH_TIMEOUT = 15.0
+
+
+def routing_error_message(error):
+    '''
+    Describe a routing failure that searching again would not fix (the API rejected the request),
+    None for transient ones such as timeouts and server errors
+    '''
+    if isinstance(error, DistanceMatrixError):
+        return f"the Distance Matrix API answered {error.status}"
+    if isinstance(error, httpx.HTTPStatusError) and 400 <= error.response.status_code < 500:
+        return f"the Distance Matrix API answered HTTP {error.response.status_code}"
+    return None
+
+
+def search_error(message):
+    '''
+    Result of a search that failed, with the message to show instead of the chargers
+    '''
+    return {"coordinate": None, "chargers": [], "complete": False, "error": message}
+
+
+class LocationSearchService:
+    '''
+    Asynchronous nearest-charger search. Geocoding overlaps with loading the charger
+    store and its spatial index, and the Distance Matrix lookups for the candidates run as
+    concurrent batches over one pooled httpx.AsyncClient. Batches that miss routing_timeout
+    are cancelled and their chargers are returned with straight-line distances instead.
+    Routes are cached per origin cell, so only chargers without a cached route are looked up.
+    With a local routing backend all the candidates are routed in one search on a worker thread.
+
+    The client lives on a private event loop in a background thread so that its connection
+    pool survives across Streamlit reruns; search() can be called from any thread.
+    '''
+    def __init__(self, maps_api_key=None, distance_matrix_url=None, geocode_url=NOMINATIM_SEARCH_URL,
+                 routing_timeout=ROUTING_TIMEOUT, candidates=20, route_cache=None, backend=None):
+        self.maps_api_key = maps_api_key
+        self.distance_matrix_url = distance_matrix_url
+        self.geocode_url = geocode_url
+        self.routing_timeout = routing_timeout
+        self.candidates = candidates
+        self.route_cache = route_cache or get_route_cache()
+        self.backend = backend or get_routing_backend(maps_api_key, distance_matrix_url)
+        self._client = None
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="location-search", daemon=True).start()
+
+    def search(self, location, n=5, timeout=SEARCH_TIMEOUT):
+        '''
+        Return the coordinates of location and the details of the n chargers nearest to it
+        '''
+        future = asyncio.run_coroutine_threadsafe(self._search(location, n), self._loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # Stop the search on the loop instead of leaving it running in the background
+            future.cancel()
+            return search_error("Searching for the location took too long, please try again")
+
+    def close(self):
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(MAPS_TIMEOUT[1], connect=MAPS_TIMEOUT[0]),
+                limits=httpx.Limits(max_connections=16, max_keepalive_connections=8),
+                headers={"User-Agent": NOMINATIM_USER_AGENT},
+            )
+        return self._client
+
+    async def _geocode(self, location):
+        # The cache is backed by SQLite, so it is used from a worker thread to keep the loop free
+        cache = await asyncio.to_thread(get_geocode_cache)
+        cached = await asyncio.to_thread(cache.get, location)
+        if cached is not MISSING:
+            return cached
+
+        response = await self._get_client().get(self.geocode_url, params={"q": location, "format": "json", "limit": 1})
+        response.raise_for_status()
+        results = response.json()
+        coordinates = (float(results[0]["lat"]), float(results[0]["lon"])) if results else None
+        await asyncio.to_thread(cache.set, location, coordinates)
+        return coordinates
+
+    async def _route(self, origin, points, destinations):
+        if not self.backend.remote:
+            return await asyncio.to_thread(lambda: list(self.backend.route(origin, points, destinations)))
+
+        params = distance_matrix_params(
+            format_coordinate(origin),
+            [format_coordinate(destination) for destination in destinations],
+            self.maps_api_key or os.environ.get("GOOGLE_API_KEY"),
+        )
+        response = await self._get_client().get(self.distance_matrix_url or DISTANCE_MATRIX_URL, params=params)
+        response.raise_for_status()
+        return list(parse_distance_matrix(response.json(), points))
+
+    async def _search(self, location, n):
+        def load_store():
+            store = get_charger_store()
+            store.spatial_index
+            return store
+
+        # Load the charger data and index while the location is being geocoded
+        store_task = asyncio.ensure_future(asyncio.to_thread(load_store))
+        try:
+            coordinate = await self._geocode(location)
+            store = await store_task
+        except (httpx.HTTPError, asyncio.TimeoutError, ValueError, LookupError):
+            # e.g. Nominatim rate limiting (429), not answering or answering with something other than results
+            return search_error("The location could not be looked up right now, please try again in a moment")
+        finally:
+            # Not left pending when geocoding failed or the search was cancelled
+            if not store_task.done():
+                store_task.cancel()
+            await asyncio.gather(store_task, return_exceptions=True)
+        if coordinate is None:
+            return {"coordinate": None, "chargers": [], "complete": True}
+
+        points, straight_line_km = store.spatial_index.query(coordinate, self.candidates)
+        charger_ids = store.df["idx"].to_numpy()
+
+        # Only candidates without a cached route from this origin cell are sent for routing
+        route_cache = self.route_cache if self.backend.remote else None
+        routed, missing = await asyncio.to_thread(lookup_routes, route_cache, coordinate, points, charger_ids)
+        destinations = [store.df.at[point, "coords"] for point in missing]
+
+        batch_size = ROUTING_BATCH_SIZE if self.backend.remote else max(len(missing), 1)
+        tasks = [
+            asyncio.ensure_future(self._route(coordinate, missing[start:start + batch_size], destinations[start:start + batch_size]))
+            for start in range(0, len(missing), batch_size)
+        ]
+        done, pending = await asyncio.wait(tasks, timeout=self.routing_timeout) if tasks else (set(), set())
+        for task in pending:
+            task.cancel()
+
+        fetched = {}
+        routing_error = None
+        for task in done:
+            if task.exception() is None:
+                fetched.update(collect_routes(task.result(), store))
+            else:
+                routing_error = routing_error or routing_error_message(task.exception())
+        complete = not pending and all(task.exception() is None for task in done)
+
+        await asyncio.to_thread(store_routes, route_cache, coordinate, fetched, charger_ids)
+        routed.update(fetched)
+
+        # Keep the candidates in order of straight-line distance, like find_nearest_coordinate
+        chargers = []
+        for point, km in zip(points, straight_line_km):
+            if point in routed:
+                address, distance, duration = routed[point]
+                chargers.append({
+                    "index": point,
+                    "coords": store.df.at[point, "coords"],
+                    "charger_type": store.df.at[point, "charger_type"],
+                    "distance": distance,
+                    "duration": duration,
+                    "address": address,
+                    "routed": True,
+                })
+            elif not complete:
+                chargers.append({
+                    "index": point,
+                    "coords": store.df.at[point, "coords"],
+                    "charger_type": store.df.at[point, "charger_type"],
+                    "distance": f"{km:.1f} km",
+                    "duration": "unknown",
+                    "address": store.df.at[point, "address"],
+                    "routed": False,
+                })
+        return {"coordinate": coordinate, "chargers": chargers[:n], "complete": complete, "routing_error": routing_error}
+
+
+resources.register("location_search_service", LocationSearchService, on_evict=LocationSearchService.close, pinned=True)
+# Search results of a session, so that reruns from interacting with the map do not search again.
+# They refer to rows of the charger store, so they are dropped when it reloads.
+resources.register("location_search", lambda location: get_location_search_service().search(location),
+                   max_entries=8, depends_on=("charger_store",), session=True)
+
+
+def get_location_search_service():
+    '''
+    Return the process-wide LocationSearchService
+    '''
+    return resources.get("location_search_service")
+
+
+def display_chargers_by_location(location):
+    '''
+    Take a location as input and display the chargers near that location
+    '''
+    # Geocode the location and find the nearest chargers. The results carry the charger details
+    # they need, so they stay consistent even if the charger data reloads meanwhile
+    result = resources.get("location_search", location)
+    if result.get("error"):
+        # Search again on the next rerun rather than keeping the failure
+        resources.invalidate("location_search", location)
+        st.error(result["error"])
+        return
+    given_coordinate = result["coordinate"]
+    if given_coordinate is None:
+        st.error("Could not find the entered location")
+        return
+    if result.get("routing_error"):
+        # Searching again would be rejected the same way, so the result is kept
+        st.warning(f"Route details are unavailable ({result['routing_error']}), so the straight line distance is shown instead")
+    elif not result["complete"]:
+        # Search again on the next rerun rather than keeping the partial result
+        resources.invalidate("location_search", location)
+        st.warning("Route details took too long for some chargers, so their straight line distance is shown instead")
+
+    display_chargers_df = []
+
+    # Display chargers
+    map = folium.Map(location=given_coordinate, zoom_start=12)
+    for i, charger in enumerate(result["chargers"]):
+        color = color_map[charger["charger_type"]]
+
+        # Create Popups
+        invisible_character = "⠀"
+        popup_distance = invisible_character.join(charger["distance"].split(" "))
+        popup_duration = invisible_character.join(charger["duration"].split(" "))
+
+        folium.Marker(location=charger["coords"],
+                      icon=folium.Icon(color=color),
+                      tooltip=charger["charger_type"],
+                      popup=f"{i}\n{popup_distance}\n{popup_duration}").add_to(map)
+
+        # Add values to display_chargers_df
+        display_chargers_df.append({
+            "Distance": charger["distance"],
+            "Duration": charger["duration"],
+            "Address": charger["address"],
+            "Charger Type": charger["charger_type"]
+        })
+
+    # Add entered location to map in red color
+    folium.Marker(location=given_coordinate,
+                  icon=folium.Icon(color="red"),
+                  tooltip="Entered Location",
+                  popup=location
+                 ).add_to(map)
+
+    st_folium.st_folium(map, width=725)
+    st.dataframe(pd.DataFrame(display_chargers_df))
@@ -0,0 +1,132 @@
+import os
+
+import folium
+import numpy as np
+import streamlit as st
+
+from folium.plugins import FastMarkerCluster
+
+from data.charger_data import color_map
+
+# Above this many chargers, markers are clustered client-side instead of rendered one by one
+MARKER_CLUSTER_THRESHOLD = 300
+
+# Builds a marker for one [latitude, longitude, color, charger_type, address] row,
+# matching what folium.Marker with a folium.Icon produces
+CHARGER_MARKER_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({
+        markerColor: row[2], iconColor: 'white', icon: 'info-sign', prefix: 'glyphicon'
+    });
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindTooltip(row[3]);
+    marker.bindPopup(row[4]);
+    return marker;
+};
+"""
+
+
+def add_charger_markers(map, df, cluster_threshold=MARKER_CLUSTER_THRESHOLD):
+    '''
+    Add a marker for every charger in df to the map. Above cluster_threshold chargers
+    the markers are sent as a single FastMarkerCluster payload and clustered in the browser.
+    '''
+    latitudes = df["latitude"].to_numpy(dtype=np.float64)
+    longitudes = df["longitude"].to_numpy(dtype=np.float64)
+    charger_types = df["charger_type"].tolist()
+    addresses = df["address"].tolist()
+    colors = [color_map[charger_type] for charger_type in charger_types]
+
+    if len(df) > cluster_threshold:
+        data = [
+            list(row) for row in zip(latitudes.tolist(), longitudes.tolist(), colors, charger_types, addresses)
+        ]
+        FastMarkerCluster(data, callback=CHARGER_MARKER_CALLBACK).add_to(map)
+        return map
+
+    for latitude, longitude, color, charger_type, address in zip(latitudes, longitudes, colors, charger_types, addresses):
+        folium.Marker(location=(latitude, longitude),
+                      icon=folium.Icon(color=color),
+                      tooltip=charger_type,
+                      popup=address).add_to(map)
+    return map
+
+
+# Size of the grid cells that chargers are counted in, as a fraction of a 256 px map tile
+GRID_CELLS_PER_TILE = 4
+
+
+def grid_cell_degrees(zoom):
+    '''
+    Side (in degrees) of the grid cells used at the given zoom level, about 64 px on screen
+    '''
+    return 360 / 2 ** zoom / GRID_CELLS_PER_TILE
+
+
+def aggregate_grid(latitudes, longitudes, cell_degrees):
+    '''
+    Count the points in each cell of a grid of cell_degrees squares.
+    Returns the mean latitude and longitude of the points in each non-empty cell and their counts.
+    '''
+    cells = np.column_stack([np.floor(latitudes / cell_degrees), np.floor(longitudes / cell_degrees)]).astype(np.int64)
+    _, inverse, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    mean_latitudes = np.bincount(inverse, weights=latitudes) / counts
+    mean_longitudes = np.bincount(inverse, weights=longitudes) / counts
+    return mean_latitudes, mean_longitudes, counts
+
+
+def add_grid_counts(map, latitudes, longitudes, zoom):
+    '''
+    Add one circle per grid cell to the map, labelled with the number of chargers in the cell
+    '''
+    mean_latitudes, mean_longitudes, counts = aggregate_grid(latitudes, longitudes, grid_cell_degrees(zoom))
+    for latitude, longitude, count in zip(mean_latitudes.tolist(), mean_longitudes.tolist(), counts.tolist()):
+        folium.CircleMarker(location=(latitude, longitude),
+                            radius=8 + 4 * float(np.log2(count)),
+                            color="#1f78b4",
+                            fill=True,
+                            fill_opacity=0.6,
+                            tooltip=f"{count} charger{'s' if count > 1 else ''}").add_to(map)
+    return map
+
+
+HEATMAP_TILES_DIRECTORY = 'static/heatmap_tiles'
+# Streamlit serves ./static at <server.baseUrlPath>/app/static when server.enableStaticServing is set
+HEATMAP_TILES_PATH = 'app/static/heatmap_tiles/{z}/{x}/{y}.png'
+HEATMAP_IMAGE_PATH = 'generation_code/heatmap/blr_heatmap2.png'
+
+
+def get_heatmap_zoom_levels():
+    '''
+    Zoom levels of the heatmap tile pyramid written by generate_heatmap.py, empty if there is none
+    '''
+    if not os.path.isdir(HEATMAP_TILES_DIRECTORY):
+        return []
+    return sorted(int(zoom) for zoom in os.listdir(HEATMAP_TILES_DIRECTORY) if zoom.isdigit())
+
+
+def get_heatmap_tiles_url():
+    '''
+    URL template of the heatmap tiles, under the base path the app is served from
+    '''
+    base_url_path = st.get_option("server.baseUrlPath").strip("/")
+    return f"/{base_url_path}/{HEATMAP_TILES_PATH}" if base_url_path else f"/{HEATMAP_TILES_PATH}"
+
+
+def add_heatmap_layer(map, show=True):
+    '''
+    Overlay the traffic heatmap tiles on the map, if they have been generated
+    '''
+    zoom_levels = get_heatmap_zoom_levels()
+    if zoom_levels:
+        folium.TileLayer(
+            tiles=get_heatmap_tiles_url(),
+            attr="ZapCharge traffic heatmap",
+            name="Traffic heatmap",
+            overlay=True,
+            show=show,
+            opacity=0.7,
+            max_native_zoom=zoom_levels[-1],
+        ).add_to(map)
+    return map
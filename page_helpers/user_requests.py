@@ -0,0 +1,321 @@
+import hashlib
+import os
+import sys
+import threading
+
+import folium
+import streamlit as st
+import streamlit_folium as st_folium
+import pandas as pd
+import numpy as np
+
+from haversine import haversine_vector
+from sklearn.neighbors import BallTree
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from helper_functions import EARTH_RADIUS_KM, resources
+
+# Upper bound on the number of pairwise distances held in memory at once
+CLUSTER_BLOCK_ELEMENTS = 4_000_000
+
+
+def cluster_by_distance(points, radius, block_elements=CLUSTER_BLOCK_ELEMENTS):
+    '''
+    Using points and specified radius, forms clusters based on density.
+    For every point, returns the later points that lie within radius km of it.
+    Distances are computed a block of rows at a time so memory stays bounded by block_elements.
+    '''
+    n = len(points)
+    coordinates = np.asarray(points, dtype=np.float64).reshape(n, 2)
+    block_size = max(1, block_elements // max(n, 1))
+
+    clusters = []
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+
+        # The last point has no later points to compare against
+        if start + 1 == n:
+            clusters.append([])
+            break
+
+        # Distances from each point in the block to every point after the start of the block (unit is km)
+        distances = haversine_vector(coordinates[start + 1:], coordinates[start:end], comb=True)
+        for row in range(end - start):
+            # Only keep points that come after the current one
+            later = np.flatnonzero(distances[row, row:] <= radius) + start + row + 1
+            clusters.append([points[j] for j in later])
+
+    return clusters
+
+class IncrementalDBSCAN:
+    '''
+    DBSCAN on (latitude, longitude) points in radians with the haversine metric, which
+    absorbs appended points instead of refitting from scratch.
+
+    The eps-neighbourhood of every point is kept, so inserting a point only queries its
+    own neighbourhood and updates the neighbours it touches. Labels are then derived from
+    the stored neighbourhood graph and match DBSCAN(algorithm='ball_tree', metric='haversine')
+    fitted on all the points: clusters are numbered in order of their first core point and
+    border points join the lowest-numbered cluster they are reachable from.
+    '''
+    def __init__(self, eps, min_samples, rebuild_ratio=0.25):
+        self.eps = eps
+        self.min_samples = min_samples
+        self.rebuild_ratio = rebuild_ratio
+
+    def fit(self, X):
+        self.X = np.asarray(X, dtype=np.float64).reshape(-1, 2)
+        self._build_tree()
+        self.neighbours = [list(nb) for nb in self._tree.query_radius(self.X, r=self.eps)]
+        self._relabel()
+        return self
+
+    @property
+    def nbytes(self):
+        '''
+        Approximate memory held by the points, the ball tree and the neighbourhood lists
+        '''
+        if not hasattr(self, "X"):
+            return 0
+        tree = sum(array.nbytes for array in self._tree.get_arrays())
+        # Every neighbour is a list slot plus, mostly, an int object of its own
+        neighbours = sum(sys.getsizeof(nb) + 28 * len(nb) for nb in self.neighbours)
+        return self.X.nbytes + tree + neighbours + self.labels_.nbytes
+
+    def _build_tree(self):
+        self._tree = BallTree(self.X, metric="haversine")
+        self._tree_size = len(self.X)
+
+    def _haversine(self, point, X):
+        dlat = X[:, 0] - point[0]
+        dlng = X[:, 1] - point[1]
+        a = np.sin(dlat / 2) ** 2 + np.cos(point[0]) * np.cos(X[:, 0]) * np.sin(dlng / 2) ** 2
+        return 2 * np.arcsin(np.sqrt(a))
+
+    def insert(self, points):
+        '''
+        Append points (radians) and update the neighbourhoods and labels they affect
+        '''
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.X = np.concatenate([self.X, points])
+
+        for m in range(len(self.X) - len(points), len(self.X)):
+            point = self.X[m]
+
+            # Neighbours among the indexed points plus the ones appended since the last rebuild
+            indexed = self._tree.query_radius(point.reshape(1, 2), r=self.eps)[0]
+            pending = np.flatnonzero(self._haversine(point, self.X[self._tree_size:m]) <= self.eps) + self._tree_size
+            neighbours = np.concatenate([indexed, pending]).tolist()
+
+            for q in neighbours:
+                self.neighbours[q].append(m)
+            self.neighbours.append(neighbours + [m])
+
+        if len(self.X) - self._tree_size > self.rebuild_ratio * self._tree_size:
+            self._build_tree()
+
+        self._relabel()
+        return self
+
+    def _relabel(self):
+        n = len(self.X)
+        counts = np.fromiter((len(nb) for nb in self.neighbours), dtype=np.intp, count=n)
+        core = counts >= self.min_samples
+        rows = np.repeat(np.arange(n), counts)
+        cols = np.fromiter((q for nb in self.neighbours for q in nb), dtype=np.intp, count=counts.sum())
+
+        # Clusters are the connected components of the graph between core points
+        core_edges = core[rows] & core[cols]
+        graph = csr_matrix((np.ones(core_edges.sum(), dtype=np.int8), (rows[core_edges], cols[core_edges])), shape=(n, n))
+        _, components = connected_components(graph, directed=False)
+
+        # Number clusters in order of their first core point
+        labels = np.full(n, -1, dtype=np.intp)
+        core_points = np.flatnonzero(core)
+        _, first, inverse = np.unique(components[core_points], return_index=True, return_inverse=True)
+        rank = np.empty(len(first), dtype=np.intp)
+        rank[np.argsort(first)] = np.arange(len(first))
+        labels[core_points] = rank[inverse]
+
+        # Border points take the lowest cluster label among their core neighbours
+        border_edges = ~core[rows] & core[cols]
+        border = np.full(n, n, dtype=np.intp)
+        np.minimum.at(border, rows[border_edges], labels[cols[border_edges]])
+        reached = ~core & (border < n)
+        labels[reached] = border[reached]
+
+        self.labels_ = labels
+        self.core_sample_indices_ = core_points
+
+
+# Bytes of DBSCAN engines kept for the (eps, min_samples) pairs that sessions asked for
+DBSCAN_ENGINE_BUDGET = 128 * 1024 ** 2
+
+# Engines grow in place, so they are measured again after every fit or insert
+resources.register("dbscan_engine", IncrementalDBSCAN, budget=DBSCAN_ENGINE_BUDGET, max_entries=8)
+_dbscan_lock = threading.Lock()
+
+
+def get_dbscan_labels(X, eps, min_samples):
+    '''
+    Return DBSCAN labels for X (radians), reusing the engine for (eps, min_samples)
+    when X only appends rows to the points it has already clustered
+    '''
+    X = np.asarray(X, dtype=np.float64).reshape(-1, 2)
+    with _dbscan_lock:
+        engine = resources.get("dbscan_engine", eps, min_samples)
+        known = len(engine.X) if hasattr(engine, "X") else 0
+        if not known or known > len(X) or not np.array_equal(engine.X, X[:known]):
+            engine.fit(X)
+        elif known < len(X):
+            engine.insert(X[known:])
+        else:
+            return engine.labels_
+        resources.resize("dbscan_engine", eps, min_samples)
+        return engine.labels_
+
+
+CLUSTER_COLORS = ['red', 'blue', 'green', 'purple', 'orange', 'darkred', 'beige', 'darkblue', 'darkgreen', 'cadetblue', 'darkpurple', 'pink', 'lightblue', 'lightgreen', 'black']
+CLUSTER_CACHE_SIZE = 32
+USER_REQUESTED_CHARGERS_PATH = "data/user_requested_chargers.csv"
+
+resources.register("user_requested_chargers", lambda mtime: pd.read_csv(USER_REQUESTED_CHARGERS_PATH), max_entries=1)
+resources.register("user_request_clusters", max_entries=CLUSTER_CACHE_SIZE, depends_on=("user_requested_chargers",))
+
+
+def dataset_hash(df):
+    '''
+    Content hash of a dataframe of coordinates
+    '''
+    return hashlib.sha1(np.ascontiguousarray(df.to_numpy(dtype=np.float64)).tobytes()).hexdigest()
+
+
+def compute_user_request_clusters(df, radius, min_samples):
+    '''
+    Run both clustering algorithms on the user requested chargers and return the
+    DBSCAN labels together with the (location, color) markers for each map
+    '''
+    n = len(CLUSTER_COLORS)
+    coordinates = df.values.tolist()
+
+    # Conventional clustering based on distances
+    clusters = [x for x in cluster_by_distance(coordinates, radius) if len(x) >= min_samples]
+    distance_markers = [
+        ((point[0], point[1]), CLUSTER_COLORS[i % n]) for i, cluster in enumerate(clusters) for point in cluster
+    ]
+
+    # Clustering based on densities (DBSCAN)
+    epsilon = 0.5 / EARTH_RADIUS_KM
+    labels = get_dbscan_labels(np.radians(df.to_numpy(dtype=np.float64)), epsilon, min_samples)
+    density_markers = [
+        (tuple(coordinates[i]), 'lightgray' if label == -1 else CLUSTER_COLORS[label % n])
+        for i, label in enumerate(labels)
+    ]
+    final_markers = [marker for marker, label in zip(density_markers, labels) if label != -1]
+
+    return {
+        "labels": labels,
+        "distance_markers": distance_markers,
+        "density_markers": density_markers,
+        "final_markers": final_markers,
+    }
+
+
+def get_user_request_clusters(df, radius, min_samples):
+    '''
+    Memoized compute_user_request_clusters, keyed by the dataset's content hash and the parameters
+    '''
+    return resources.get(
+        "user_request_clusters", dataset_hash(df), float(radius), int(min_samples),
+        factory=lambda: compute_user_request_clusters(df, radius, min_samples),
+    )
+
+
+def add_cluster_markers(map, markers):
+    '''
+    Add (location, color) markers to the map
+    '''
+    for location, color in markers:
+        folium.Marker(location=location, icon=folium.Icon(color=color)).add_to(map)
+    return map
+
+
+def display_user_requested_chargers():
+    '''
+    Perform clustering on user requested chargers and display the results
+    '''
+    # Read csv file containing user requested chargers, shared by every session until it changes
+    df = resources.get("user_requested_chargers", os.path.getmtime(USER_REQUESTED_CHARGERS_PATH))
+
+    city_coords = (12.9725881014472, 77.59406890113576)
+
+    coordinates = df.values.tolist()
+
+    st.write("###  Locations requested by users ")
+
+    # Create streamlit columns
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        st.write("##### Shown below is a map of user recommended locations that was generated by us for this demonstration.")
+        user_requests_map = folium.Map(location=(12.9725881014472, 77.6406890113576), zoom_start=12, control_scale = True)
+        for latitude, longitude in coordinates:
+            folium.Marker(location=(latitude, longitude), icon=folium.Icon()).add_to(user_requests_map)
+        st_folium.st_folium(user_requests_map, width=725, key="user_requests_map")
+    with col2:
+        st.write("##### Here, you can see the values that we generated.")
+        st.dataframe(df, width=300, height=725)
+    with col3:
+        # Add new value
+        st.write("##### You can add new values to the table below. This will help us improve our algorithm.")
+        new_latitude = st.text_input("Latitude")
+        new_longitude = st.text_input("Longitude")
+        if st.button("Add"):
+            if new_latitude and new_longitude:
+                try:
+                    new_row = pd.DataFrame.from_dict({"latitude": [float(new_latitude)], "longitude": [float(new_longitude)]})
+                except ValueError:
+                    st.error("Latitude and longitude must be numbers")
+                else:
+                    df = pd.concat([df, new_row])
+                    df.to_csv(USER_REQUESTED_CHARGERS_PATH, index=False)
+                    resources.invalidate("user_requested_chargers")
+                    st.success("Added new value")
+                    st.experimental_rerun()
+            else:
+                st.error("Please enter both latitude and longitude")
+
+    st.write("### Configuring values for the alogorithm")
+    st.write("##### The user can change these values according to their needs. We have set the default values to the ones that we found to be the most optimal.")
+
+    # Configuration - Input boxes for radius and min samples
+    radius = st.number_input("Radius", min_value=0.1, max_value=10.0, value=0.5, step=0.1)
+    min_samples = st.number_input("Minimum Samples", min_value=5, max_value=50, value=15, step=5)
+
+
+    # Clustering results and marker payloads are served from the cache when nothing changed
+    results = get_user_request_clusters(df, radius, min_samples)
+
+    st.write("### Clusters formed based on distances (Conventional Clustering)")
+    st.write("##### Since the earth is curved, Euclidean distance is not the most appropriate. So, we have computed Haversine distance, that takes into account the curvature of the earth to find distances between all the points. Using this we have used a conventional clustering algorithm to form clusters.")
+
+    distance_based_clusters_map = folium.Map(location=city_coords, zoom_start=12)
+    add_cluster_markers(distance_based_clusters_map, results["distance_markers"])
+    st_folium.st_folium(distance_based_clusters_map, width=725, key="distance_based_clusters_map")
+
+    st.write("### Clusters formed based on densities (DBSCAN Algorithm)")
+    st.write("##### As you saw, the results of the conventional clustering algorithm were not that great. To improve on this, we used the DBSCAN algorithm to construct better clusters.")
+    st.warning("Note: The grey markers don't belong to any cluster.")
+
+    density_based_clusters_map = folium.Map(location=city_coords, zoom_start=12, control_scale = True)
+    add_cluster_markers(density_based_clusters_map, results["density_markers"])
+    st_folium.st_folium(density_based_clusters_map, width=725, key="density_based_clusters_map")
+
+
+    st.write("### Final Result - Removing points not part of any cluster")
+    st.write("##### After removing the points that don't belong to any cluster we obtain this final result. This can be used by EV charger companies to place their chargers in optimal locations.")
+
+    density_based_clusters_map_1 = folium.Map(location=city_coords, zoom_start=12, control_scale = True)
+    add_cluster_markers(density_based_clusters_map_1, results["final_markers"])
+    st_folium.st_folium(density_based_clusters_map_1, width=725, key="density_based_clusters_map_1")
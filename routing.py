@@ -0,0 +1,260 @@
+'''
+Offline routing over an OpenStreetMap road network extract.
+
+Build the graph once from an OSM XML extract (e.g. exported from openstreetmap.org or
+converted from a .pbf with osmium) with
+
+    python routing.py bangalore.osm
+
+which writes a compact CSR adjacency array to data/road_graph.npz. RoadGraph answers
+one-to-many shortest-path queries on it with a multi-target A* search.
+'''
+import heapq
+import sys
+import xml.etree.ElementTree as ET
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.neighbors import BallTree
+
+EARTH_RADIUS_KM = 6371.0
+ROAD_GRAPH_PATH = 'data/road_graph.npz'
+
+# Free-flow speeds (km/h) of the OSM highway types that cars can use, used when a way has no maxspeed
+HIGHWAY_SPEEDS = {
+    "motorway": 80, "motorway_link": 50,
+    "trunk": 60, "trunk_link": 40,
+    "primary": 45, "primary_link": 35,
+    "secondary": 35, "secondary_link": 30,
+    "tertiary": 30, "tertiary_link": 25,
+    "unclassified": 25, "residential": 20,
+    "living_street": 10, "service": 15,
+}
+# Speed (km/h) assumed between a coordinate and the road node it is snapped to
+SNAP_SPEED = 15
+
+
+def haversine_km(latitude_1, longitude_1, latitude_2, longitude_2):
+    '''
+    Great-circle distance in km between points given in degrees, broadcasting like numpy
+    '''
+    latitude_1, longitude_1, latitude_2, longitude_2 = map(np.radians, (latitude_1, longitude_1, latitude_2, longitude_2))
+    a = (np.sin((latitude_2 - latitude_1) / 2) ** 2
+         + np.cos(latitude_1) * np.cos(latitude_2) * np.sin((longitude_2 - longitude_1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def format_distance(km):
+    '''
+    Distance in the style of the Distance Matrix API, e.g. "850 m" or "3.4 km"
+    '''
+    if km < 1:
+        return f"{round(km * 1000)} m"
+    return f"{km:.1f} km"
+
+
+def format_duration(seconds):
+    '''
+    Duration in the style of the Distance Matrix API, e.g. "1 min" or "1 hour 5 mins"
+    '''
+    minutes = max(1, round(seconds / 60))
+    hours, minutes = divmod(minutes, 60)
+    parts = []
+    if hours:
+        parts.append(f"{hours} hour{'s' if hours > 1 else ''}")
+    if minutes or not hours:
+        parts.append(f"{minutes} min{'s' if minutes > 1 else ''}")
+    return " ".join(parts)
+
+
+def parse_speed(maxspeed, highway):
+    '''
+    Speed (km/h) of a way from its maxspeed tag, falling back to the default for its highway type
+    '''
+    if maxspeed:
+        value = maxspeed.split()[0].split(";")[0]
+        if value.isdigit():
+            speed = int(value)
+            return speed * 1.609 if "mph" in maxspeed else speed
+    return HIGHWAY_SPEEDS[highway]
+
+
+class RoadGraph:
+    '''
+    Directed road network in CSR form. The edges leaving node i are
+    indices[indptr[i]:indptr[i + 1]], with their lengths in km and free-flow durations in seconds.
+    '''
+    def __init__(self, indptr, indices, length_km, duration_s, latitude, longitude):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.length_km = np.asarray(length_km, dtype=np.float32)
+        self.duration_s = np.asarray(duration_s, dtype=np.float32)
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        # Fastest speed on any edge, keeps the A* heuristic admissible
+        self.max_speed_kmh = float(np.max(self.length_km / np.maximum(self.duration_s, 1e-6) * 3600)) if len(self.indices) else 1.0
+        self._tree = None
+        self._adjacency = None
+
+    def __len__(self):
+        return len(self.latitude)
+
+    @classmethod
+    def from_edges(cls, sources, targets, length_km, duration_s, latitude, longitude):
+        '''
+        Build the CSR arrays from an edge list, keeping only the largest strongly connected
+        component so that every node can reach every other node
+        '''
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        n = len(latitude)
+
+        adjacency = csr_matrix((np.ones(len(sources)), (sources, targets)), shape=(n, n))
+        _, labels = connected_components(adjacency, directed=True, connection="strong")
+        keep_nodes = labels == np.bincount(labels).argmax()
+        keep_edges = keep_nodes[sources] & keep_nodes[targets]
+
+        renumber = np.cumsum(keep_nodes) - 1
+        sources = renumber[sources[keep_edges]]
+        targets = renumber[targets[keep_edges]]
+        order = np.argsort(sources, kind="stable")
+        indptr = np.zeros(keep_nodes.sum() + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(sources, minlength=keep_nodes.sum()))
+        return cls(
+            indptr, targets[order],
+            np.asarray(length_km)[keep_edges][order], np.asarray(duration_s)[keep_edges][order],
+            np.asarray(latitude)[keep_nodes], np.asarray(longitude)[keep_nodes],
+        )
+
+    @classmethod
+    def from_osm(cls, path):
+        '''
+        Build the graph from the drivable ways of an OSM XML extract
+        '''
+        coordinates = {}
+        ways = []
+        for _, element in ET.iterparse(path):
+            if element.tag == "node":
+                coordinates[int(element.get("id"))] = (float(element.get("lat")), float(element.get("lon")))
+            elif element.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+                highway = tags.get("highway")
+                if highway in HIGHWAY_SPEEDS:
+                    refs = [int(nd.get("ref")) for nd in element.iter("nd")]
+                    oneway = tags.get("oneway", "yes" if highway in ("motorway", "motorway_link") or tags.get("junction") == "roundabout" else "no")
+                    if oneway == "-1":
+                        refs.reverse()
+                    ways.append((refs, oneway in ("yes", "true", "1", "-1"), parse_speed(tags.get("maxspeed"), highway)))
+            if element.tag in ("node", "way", "relation"):
+                element.clear()
+
+        sources, targets, speeds = [], [], []
+        for refs, oneway, speed in ways:
+            refs = [ref for ref in refs if ref in coordinates]
+            for u, v in zip(refs, refs[1:]):
+                sources.append(u)
+                targets.append(v)
+                speeds.append(speed)
+                if not oneway:
+                    sources.append(v)
+                    targets.append(u)
+                    speeds.append(speed)
+
+        # Renumber the OSM ids of the nodes used by the roads to 0..n-1
+        node_ids, inverse = np.unique(np.array(sources + targets, dtype=np.int64), return_inverse=True)
+        sources, targets = inverse[:len(sources)], inverse[len(sources):]
+        latitude, longitude = np.array([coordinates[node_id] for node_id in node_ids]).reshape(-1, 2).T
+
+        length_km = haversine_km(latitude[sources], longitude[sources], latitude[targets], longitude[targets])
+        duration_s = length_km / np.array(speeds, dtype=np.float64) * 3600
+        return cls.from_edges(sources, targets, length_km, duration_s, latitude, longitude)
+
+    @classmethod
+    def load(cls, path=ROAD_GRAPH_PATH):
+        with np.load(path) as data:
+            return cls(data["indptr"], data["indices"], data["length_km"], data["duration_s"], data["latitude"], data["longitude"])
+
+    def save(self, path=ROAD_GRAPH_PATH):
+        np.savez(path, indptr=self.indptr, indices=self.indices, length_km=self.length_km,
+                 duration_s=self.duration_s, latitude=self.latitude, longitude=self.longitude)
+
+    def snap(self, latitude, longitude):
+        '''
+        Nearest road node to every point and the great-circle distance (km) to it
+        '''
+        if self._tree is None:
+            self._tree = BallTree(np.radians(np.column_stack([self.latitude, self.longitude])), metric="haversine")
+        points = np.radians(np.column_stack([np.atleast_1d(latitude), np.atleast_1d(longitude)]).astype(np.float64))
+        distances, nodes = self._tree.query(points, k=1)
+        return nodes[:, 0], distances[:, 0] * EARTH_RADIUS_KM
+
+    def shortest_paths(self, source, targets):
+        '''
+        Fastest-path duration (s) and its length (km) from source to every target node,
+        inf where a target is unreachable. A single A* search settles all the targets, guided by
+        the straight-line time to the closest target, and stops as soon as the last one is settled.
+        '''
+        if self._adjacency is None:
+            self._adjacency = (self.indptr.tolist(), self.indices.tolist(), self.duration_s.tolist(), self.length_km.tolist())
+        indptr, indices, duration_s, length_km = self._adjacency
+
+        targets = np.asarray(targets, dtype=np.int64)
+        remaining = set(targets.tolist())
+        target_latitude = self.latitude[targets]
+        target_longitude = self.longitude[targets]
+        seconds_per_km = 3600 / self.max_speed_kmh
+
+        heuristics = {}
+
+        def heuristic(node):
+            if node not in heuristics:
+                km = haversine_km(self.latitude[node], self.longitude[node], target_latitude, target_longitude).min()
+                heuristics[node] = km * seconds_per_km
+            return heuristics[node]
+
+        durations = {source: 0.0}
+        lengths = {source: 0.0}
+        settled = set()
+        heap = [(heuristic(source), 0.0, source)]
+        while heap and remaining:
+            _, duration, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+            remaining.discard(node)
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[edge]
+                candidate = duration + duration_s[edge]
+                if candidate < durations.get(neighbour, np.inf):
+                    durations[neighbour] = candidate
+                    lengths[neighbour] = lengths[node] + length_km[edge]
+                    heapq.heappush(heap, (candidate + heuristic(neighbour), candidate, neighbour))
+
+        reached = [target in settled for target in targets.tolist()]
+        return (
+            np.array([durations[target] if ok else np.inf for target, ok in zip(targets.tolist(), reached)]),
+            np.array([lengths[target] if ok else np.inf for target, ok in zip(targets.tolist(), reached)]),
+        )
+
+    def route(self, origin, destinations):
+        '''
+        Road distance (km) and estimated duration (s) from origin to every destination,
+        both (latitude, longitude). The stretches to and from the nearest road nodes are added
+        at SNAP_SPEED.
+        '''
+        destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+        (source,), (source_km,) = self.snap(origin[0], origin[1])
+        targets, target_km = self.snap(destinations[:, 0], destinations[:, 1])
+        duration_s, length_km = self.shortest_paths(source, targets)
+
+        snap_km = source_km + target_km
+        return length_km + snap_km, duration_s + snap_km / SNAP_SPEED * 3600
+
+
+if __name__ == '__main__':
+    osm_path = sys.argv[1]
+    output_path = sys.argv[2] if len(sys.argv) > 2 else ROAD_GRAPH_PATH
+    graph = RoadGraph.from_osm(osm_path)
+    graph.save(output_path)
+    print(f"STATUS: Road graph with {len(graph)} nodes and {len(graph.indices)} edges written to {output_path}")
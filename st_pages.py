@@ -1,9 +1,13 @@
 import streamlit as st
 
-from data.charger_data import states, cities
-from helper_functions import display_chargers_by_location, display_city_chargers, display_charger_consumption_data, display_user_requested_chargers
+from data.charger_data import states
+
+# Each view imports its page helpers when it is first shown, so a session only loads
+# the dependencies of the pages it opens
 
 def chargers_by_city_view():
+    from page_helpers.city import display_city_chargers, get_city_choices
+
     st.write("## Chargers by City")
     st.write("##### This view lets the user select the states and the cities present in them and displays the EV chargers present in the selected cities. It provides a good understanding of the current state of the EV charging network.") 
     st.warning("###### Choose the states and their respective cities to view the chargers present in them. You can choose multiple states and cities.")
@@ -13,10 +17,8 @@ def chargers_by_city_view():
 
     # Choose city (based on state)
     city = None
-    city_choices = []
     if state_choices:
-        for state in state_choices:
-            city_choices.extend(cities[state])
+        city_choices = get_city_choices(tuple(state_choices))
         city = st.multiselect("Choose City", city_choices)
     else:
         st.write("Choose a state to see the cities")
@@ -25,7 +27,17 @@ def chargers_by_city_view():
         st.success("Hover over the chargers to view charger company and click on them to see the address")
         display_city_chargers(city)
 
+    st.write("### Charger Density")
+    st.write("##### The density map counts the chargers in every cell of a grid over India, to show which areas are well covered and which have few or no chargers. Hover over a cell to see its chargers by company.")
+
+    # Only built when asked for, so opening the landing page stays cheap
+    if st.checkbox("Show charger density map"):
+        from page_helpers.density import display_charger_density
+        display_charger_density()
+
 def chargers_by_location_view():
+    from page_helpers.location import display_chargers_by_location
+
     st.write("## Chargers by Location")
     st.write("##### This view lets ther enter any location in India and displays the 5 closest EV chargers and their details. This can be very helpful when an EV user is running out of charge and needs to find the closest EV charger.")
 
@@ -38,19 +50,23 @@ def chargers_by_location_view():
         
 
 def user_requested_chargers_view():
+    from page_helpers.user_requests import display_user_requested_chargers
+
     st.write("## User Requested Chargers")
     st.write("##### The best way to figure out where the users want chargers is to ask the users themselves. Once the users recommend chargers, we can perform clustering to get the locations of approporiate charger placements.")
     
     display_user_requested_chargers()
 
 def display_heatmap_info():
+    from page_helpers.heatmap import display_heatmap_map, display_traffic_heatmap_by_time
+
     st.write("## Traffic Heatmap ")
 
     sample_map_image1 = "generation_code/heatmap/Map_images/Original_map_images/Sun_8.png"
     sample_map_image2 = "generation_code/heatmap/Map_images/Original_map_images/fri_20.png"
 
     st.write("##### The heatmap below shows the traffic data patterns in each city. The darker the color, the more traffic in that city. ")
-    st.image('generation_code/heatmap/blr_heatmap2.png', caption="Heatmap Imposed on Map", width=1080)
+    display_heatmap_map(key="heatmap_map")
 
     st.write("### Bulding the Heatmap - Google Maps API")
 
@@ -90,9 +106,15 @@ def display_heatmap_info():
     with col1:
         st.image('generation_code/heatmap/heatmap.png', caption="Heatmap")
     with col2:
-        st.image('generation_code/heatmap/blr_heatmap2.png', caption="Heatmap Imposed on Map")
+        display_heatmap_map(key="heatmap_map_2", width=530)
+
+    st.subheader("Heatmap by time of day")
+    st.write("##### Every traffic snapshot is also kept by day of the week and hour, so the heatmap can be built for any combination of them. For example, choose the weekdays and the evening hours to see where traffic builds up after work.")
+    display_traffic_heatmap_by_time()
 
 def charger_consumption_data_view():
+    from page_helpers.consumption import display_charger_consumption_data
+
     st.write("## Consumption Data")
     
     st.markdown(
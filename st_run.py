@@ -1,3 +1,5 @@
+import os
+
 import streamlit as st
 from streamlit_option_menu import option_menu
 
@@ -33,3 +35,10 @@ elif selected == "Traffic Heatmap":
     display_heatmap_info()
 elif selected == "Charger Consumption Data":
     charger_consumption_data_view()
+
+# Hit / miss counts and memory of the shared resources, for tuning their budgets
+if os.environ.get("ZAPCHARGE_RESOURCE_STATS"):
+    from helper_functions import resources
+
+    with st.sidebar.expander("Shared resources"):
+        st.dataframe([{"resource": name, **stats} for name, stats in resources.stats().items()])